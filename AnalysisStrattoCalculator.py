@@ -15,18 +15,25 @@
 
 # --------------------------- Modules Importation --------------------------- #
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-import scipy.signal as signal
-import scipy.integrate as integration
 import argparse
+import collections
+import contextlib
+import functools
 import h5py
+import hashlib
+import inspect
+import json
+import os
+import queue
+import threading
 import time
-from mpi4py import MPI
-from mpl_toolkits.axes_grid1 import make_axes_locatable
+import warnings
 import vphys
 
+# -- matplotlib, mpi4py and the scipy modules (integrate, signal, fft and
+# -- constants) are imported by the functions that use them, so that importing
+# -- this module stays fast.
+
 # -- CONSTANTS
 UNIT_MASS      = 9.109382914e-31
 UNIT_LENGTH    = 3.86159e-13
@@ -38,6 +45,18 @@ ALPHA          = 1.0/137.035999074
 UNIT_E_FIELD   = 1.3e18*np.sqrt(4*np.pi*ALPHA)
 UNIT_B_FIELD   = UNIT_E_FIELD/SPEED_OF_LIGHT
 
+# -- Name of the consolidated dataset written by ConsolidateFieldFile.
+FIELD_STORE    = "/field_store"
+
+# -- Target size of its chunks, and bounds of the chunk cache it is read with.
+STORE_CHUNK_BYTES     = 2**20
+STORE_CACHE_MIN_BYTES = 2**20
+STORE_CACHE_MAX_BYTES = 2**28
+
+# -- Real and complex dtypes of the working arrays for each precision.
+PRECISIONS     = {"double": (np.float64, np.complex128),
+                  "single": (np.float32, np.complex64)}
+
 def PlotAllFieldComponentsOnAPlane(X,Y,Ex,Ey,Ez,Bx,By,Bz,filename,
                                    normalization=False,
                                    xlabel=r"$x$ [\si{\micro\metre}]",
@@ -65,6 +84,9 @@ def PlotAllFieldComponentsOnAPlane(X,Y,Ex,Ey,Ez,Bx,By,Bz,filename,
     By /= maxComponent
     Bz /= maxComponent
 
+  import matplotlib.pyplot as plt
+  from mpl_toolkits.axes_grid1 import make_axes_locatable
+
   # -- We prepare the figure.
   figComponents = plt.figure(figsize=(7,4))
   figComponents.subplots_adjust(hspace=0.3,wspace=0.7)
@@ -151,7 +173,551 @@ def PlotAllFieldComponentsOnAPlane(X,Y,Ex,Ey,Ez,Bx,By,Bz,filename,
 
   plt.close(figComponents)
 
+def SimpsonWeights(x):
+  """
+  Returns the weights w such that integration.simpson(f, x=x) == np.dot(w, f).
+  Since Simpson's rule is linear, they are obtained by integrating the
+  elements of the canonical basis.
+  """
+  import scipy.integrate as integration
+  return integration.simpson(np.eye(len(x)), x=x)
+
+def CellEdges(x, period=None):
+  """
+  Returns the edges of the cells centred on the points of the grid x, i.e.
+  the midpoints between neighbouring points. Without a period, the first and
+  last cells stop at the end points of the grid. With a period, the grid wraps
+  around, so that the cells cover exactly one period (a point repeated at
+  both ends of the grid gets two half cells).
+  """
+  x = np.asarray(x, dtype=float)
+  if period is None:
+    return np.concatenate(([x[0]], 0.5*(x[1:]+x[:-1]), [x[-1]]))
+
+  x = np.concatenate(([x[-1]-period], x, [x[0]+period]))
+  return 0.5*(x[1:]+x[:-1])
+
+def WindowIndices(x, low=None, high=None):
+  """
+  Returns the range of the indices of the points of the increasing grid x that
+  lie in the closed interval [low, high]. Either bound can be None, in which
+  case the grid is not cut on that side.
+  """
+  start = 0      if low  is None else np.searchsorted(x, low,  side='left')
+  stop  = x.size if high is None else np.searchsorted(x, high, side='right')
+  return range(int(start), int(stop))
+
+def ComposeSelection(region, selection=()):
+  """
+  Maps a selection over a region of a mesh, i.e. a tuple of indices, slices
+  or index arrays that refer to the points of the region, to the same
+  selection over the whole mesh. The region holds, for each axis, the range or
+  the increasing array of the indices of its points in the whole mesh. Ranges
+  are mapped back to slices, so that the selections stay hyperslabs whenever
+  possible.
+  """
+  selection = tuple(selection) + (slice(None),)*(len(region)-len(selection))
+  composed  = []
+  for axis, index in zip(region, selection):
+    if isinstance(index, slice) or np.ndim(index) == 0:
+      picked = axis[index]
+    else:
+      picked = np.asarray(axis)[index]
+
+    if isinstance(picked, range):
+      picked = slice(picked.start, picked.stop, picked.step)
+    elif np.ndim(picked) == 0:
+      picked = int(picked)
+    composed.append(picked)
+
+  return tuple(composed)
+
+def SumOfProducts(left, right, out=None, work=None):
+  """
+  Returns sum_i left[i]*right[i] for two sequences of arrays of the same
+  shape, using in-place ufuncs only. The result is written in out and the
+  products are formed in work. Both are allocated when they are not given.
+  """
+  out = np.multiply(left[0], right[0], out=out)
+  for a, b in zip(left[1:], right[1:]):
+    work = np.multiply(a, b, out=work)
+    out += work
+  return out
+
+def SpectralMoments(frequencies, spectra, axis=-1):
+  """
+  Computes the centroid and the RMS bandwidth of power spectra (a single
+  spectrum or a whole block of them) along the given axis, sampled at the
+  given frequencies. Spectra that vanish get NaN.
+  """
+  spectra   = np.moveaxis(spectra, axis, -1)
+  total     = np.sum(spectra, axis=-1)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    centroid  = np.dot(spectra, frequencies)/total
+    spread    = np.einsum('...k,...k->...', spectra, np.square(frequencies-centroid[...,np.newaxis]))/total
+
+  return centroid[()], np.sqrt(spread)[()]
+
+def Prefetch(read, indices, buffers):
+  """
+  Iterates over indices and yields (i, data) pairs, where data = read(i, buffer)
+  is the data of step i, normally read into one of the given buffers. The
+  reads are done by a background thread, up to len(buffers)-1 steps ahead of
+  the caller, so that they overlap with the processing of the current step.
+  The buffers are used in turn: the data of a step is only valid until the
+  next step is requested.
+  """
+  free     = queue.Queue()
+  ready    = queue.Queue()
+  finished = object()
+  stop     = threading.Event()
+  for buffer in buffers:
+    free.put(buffer)
+
+  def Reader():
+    try:
+      for i in indices:
+        buffer = free.get()
+        if stop.is_set():
+          return
+        ready.put((i, read(i, buffer), buffer))
+      ready.put((finished, None, None))
+    except Exception as error:
+      ready.put((error, None, None))
+
+  reader = threading.Thread(target=Reader, daemon=True)
+  reader.start()
+
+  try:
+    while True:
+      i, data, buffer = ready.get()
+      if i is finished:
+        return
+      if isinstance(i, Exception):
+        raise i
+      yield i, data
+      free.put(buffer)
+  finally:
+    # -- We wake up the reader if it waits for a buffer.
+    stop.set()
+    free.put(None)
+    reader.join()
+
+def EnvelopeDurations(signals, dt, axis=-1):
+  """
+  Computes the FWHM durations of the envelope and of the squared envelope of
+  signals (a single signal or a whole block of them) along the given axis. The
+  envelope is obtained from the Hilbert transform, computed along that axis in
+  a single call, and the edges of the FWHM are the first and last samples above
+  half of the maximum of each signal. Signals that vanish get NaN.
+  """
+  import scipy.signal as signal
+
+  envelope  = np.moveaxis(np.abs(signal.hilbert(signals, axis=axis)), axis, -1)
+
+  durations = []
+  for power in (envelope, np.square(envelope)):
+    above     = power > np.amax(power, axis=-1, keepdims=True)/2
+    first     = np.argmax(above, axis=-1)
+    last      = power.shape[-1]-1-np.argmax(above[...,::-1], axis=-1)
+    durations.append(np.where(np.any(above, axis=-1), dt*(last-first), np.nan)[()])
+
+  return durations[0], durations[1]
+
 # ---------------------------- Class Definition ----------------------------- #
+class FocalPlaneCandidates:
+  """
+  We keep track of the temporal evolution of a functional in the z planes that
+  have contained the running maximum of a time sweep. This allows the focal
+  plane to be extracted in the same pass as the maxima. At most maxCandidates
+  planes are recorded; when there are more, the plane with the lowest maximum
+  is dropped. The timesteps that were not recorded for the final focal plane
+  (e.g. those preceding the step at which it became the maximum) are
+  evaluated at the end, by reading that single plane from the file.
+  """
+
+  def __init__(self, evaluatePlane, maxCandidates=4):
+    """
+    evaluatePlane(timeIdx, z_idx, bundle) must return the value of the stored
+    functional in the plane z_idx at timeIdx. bundle is the full timestep when
+    it is in memory, and None when the plane must be read from the file.
+    """
+    if maxCandidates < 1:
+      raise ValueError("At least one candidate plane must be kept, not {}.".format(maxCandidates))
+
+    self.evaluatePlane = evaluatePlane
+    self.maxCandidates = maxCandidates
+    self.planes        = {}
+    self.peaks         = {}
+    self.best          = None
+    self.bestValue     = -np.inf
+
+  def Update(self, timeIdx, bundle, z_idx, value):
+    """
+    Records the timestep timeIdx, whose maximum value is located in the plane
+    z_idx, in all the candidate planes.
+    """
+    if (value > self.bestValue):
+      self.best      = z_idx
+      self.bestValue = value
+      self.peaks[z_idx] = value
+      self.planes.setdefault(z_idx, {})
+
+      while (len(self.planes) > self.maxCandidates):
+        lowest = min((z for z in self.planes if z != self.best), key=self.peaks.get)
+        del self.planes[lowest]
+        del self.peaks[lowest]
+
+    for z, plane in self.planes.items():
+      plane[timeIdx] = self.evaluatePlane(timeIdx, z, bundle)
+
+  def GetPlane(self, z_idx, timeIndices):
+    """
+    Returns the temporal evolution of the functional in the plane z_idx, with
+    time along the last axis. Timesteps that were not recorded are evaluated
+    from the file.
+    """
+    recorded = self.planes.get(z_idx, {})
+    plane    = None
+    for n, i in enumerate(timeIndices):
+      value = recorded[i] if i in recorded else self.evaluatePlane(i, z_idx, None)
+      if plane is None:
+        plane = np.zeros(value.shape+(len(timeIndices),), dtype=value.dtype)
+      plane[...,n] = value
+
+    return plane
+
+class ComponentCache:
+  """
+  We keep the most recently used field components (e.g. the complex frequency
+  components, whose computation requires reading the amplitude and the phase)
+  in memory, up to a budget of maxBytes bytes. When the budget is exceeded,
+  the least recently used components are evicted. The hits and misses are
+  counted to help choose the budget.
+  """
+
+  # -- Default memory budget, in bytes.
+  DEFAULT_BYTES = 2**28
+
+  def __init__(self, maxBytes=DEFAULT_BYTES):
+    self.maxBytes = maxBytes
+    self.entries  = collections.OrderedDict()
+    self.nbytes   = 0
+    self.hits     = 0
+    self.misses   = 0
+
+  def Get(self, key, load):
+    """
+    Returns the array associated to key, calling load() to obtain it if it is
+    not in the cache. Cached arrays are made read-only, since they are shared
+    between the callers.
+    """
+    if key in self.entries:
+      self.hits += 1
+      self.entries.move_to_end(key)
+      return self.entries[key]
+
+    self.misses += 1
+    value = load()
+    if value.nbytes <= self.maxBytes:
+      value.flags.writeable = False
+      self.entries[key]     = value
+      self.nbytes          += value.nbytes
+
+      while self.nbytes > self.maxBytes:
+        oldKey, oldValue = self.entries.popitem(last=False)
+        self.nbytes     -= oldValue.nbytes
+
+    return value
+
+  def Lookup(self, key):
+    """
+    Returns the array associated to key if it is in the cache, and None
+    otherwise. Unlike Get, nothing is loaded or counted as a miss.
+    """
+    if key not in self.entries:
+      return None
+
+    self.hits += 1
+    self.entries.move_to_end(key)
+    return self.entries[key]
+
+  def Clear(self):
+    """
+    Empties the cache and resets the counters.
+    """
+    self.entries.clear()
+    self.nbytes = 0
+    self.hits   = 0
+    self.misses = 0
+
+class Workspace:
+  """
+  We keep named work arrays that are reused from one call to the next, e.g.
+  by the functionals evaluated at every timestep. A buffer is only
+  reallocated when it is requested larger than before or with another dtype;
+  smaller requests get a view of its beginning.
+  """
+
+  def __init__(self):
+    self.buffers = {}
+
+  def Get(self, name, shape, dtype=float):
+    """
+    Returns the work array name, with the given shape and dtype. Its content
+    is undefined.
+    """
+    size   = int(np.prod(shape))
+    dtype  = np.dtype(dtype)
+    buffer = self.buffers.get(name)
+    if buffer is None or buffer.size < size or buffer.dtype != dtype:
+      buffer = self.buffers[name] = np.empty(size, dtype=dtype)
+
+    return buffer[:size].reshape(shape)
+
+  def Clear(self):
+    """
+    Releases the work arrays.
+    """
+    self.buffers.clear()
+
+def FileIdentity(inputs):
+  """
+  Returns a description of the given files (path, size and modification time)
+  that changes whenever one of them is rewritten.
+  """
+  return json.dumps([[os.path.abspath(f), os.path.getsize(f), os.stat(f).st_mtime_ns] for f in inputs])
+
+def BlockReduce(ufunc, array, blockShape):
+  """
+  Reduces the trailing axes of array with ufunc (e.g. np.maximum) over blocks
+  of blockShape points. The last blocks along each axis may be smaller.
+  """
+  for axis, block in enumerate(blockShape, start=array.ndim-len(blockShape)):
+    array = ufunc.reduceat(array, np.arange(0, array.shape[axis], block), axis=axis)
+  return array
+
+class ResultsCache:
+  """
+  We keep the derived results of the analyses (maxima, energy curves,
+  extracted planes, ...) in an HDF5 file, so that running an analysis again on
+  the same files does not sweep them again. By default, the file is stored
+  next to the first input file.
+
+  Each entry is keyed by the method, its parameters and the identity (path,
+  size and modification time) of the input files, so that several sets of
+  files can share a cache file. Entries computed from older versions of the
+  same files are discarded. A cache file that cannot be read (e.g. truncated
+  by a killed job, or locked by another one) only raises a warning, and
+  behaves as if it were empty.
+  """
+
+  def __init__(self, inputs, filename=None):
+    if filename is None:
+      filename = os.path.splitext(inputs[0])[0]+".results.h5"
+
+    self.filename = filename
+    self.identity = FileIdentity(inputs)
+    self.paths    = self.Paths(self.identity)
+
+  def Key(self, call):
+    """
+    Returns the name of the entry of call for this version of the inputs.
+    """
+    return hashlib.sha1((self.identity+call).encode()).hexdigest()
+
+  def Load(self, call):
+    """
+    Returns (True, result) if the result of call (a description of the method
+    and of its parameters) is in the cache, and (False, None) otherwise.
+    """
+    key = self.Key(call)
+    if not os.path.exists(self.filename):
+      return False, None
+
+    try:
+      with h5py.File(self.filename, 'r') as cache:
+        if key not in cache or cache[key].attrs['identity'] != self.identity or cache[key].attrs['call'] != call:
+          return False, None
+        return True, self.Read(cache[key]['result'])
+    except (OSError, KeyError, ValueError) as error:
+      warnings.warn("Could not read {} from {}: {}".format(call, self.filename, error))
+      return False, None
+
+  def Store(self, call, result):
+    """
+    Stores the result of call, which can be an array, a scalar, or tuples and
+    dictionaries of those.
+    """
+    key = self.Key(call)
+    with h5py.File(self.filename, 'a') as cache:
+      for name in list(cache):
+        identity = cache[name].attrs.get('identity')
+        if name == key or (identity != self.identity and self.Paths(identity) == self.paths):
+          del cache[name]
+
+      entry = cache.create_group(key)
+      entry.attrs['identity'] = self.identity
+      entry.attrs['call']     = call
+      self.Write(entry, 'result', result)
+
+  @staticmethod
+  def Paths(identity):
+    """
+    Returns the paths of the files described by identity (see FileIdentity),
+    or None if it cannot be decoded.
+    """
+    try:
+      return [path for path, size, mtime in json.loads(identity)]
+    except (TypeError, ValueError):
+      return None
+
+  def Write(self, group, name, value):
+    """
+    Writes value in group, recursively for tuples and dictionaries.
+    """
+    if isinstance(value, (tuple, list, dict)):
+      node  = group.create_group(name)
+      items = value.items() if isinstance(value, dict) else [(str(n), v) for n, v in enumerate(value)]
+      node.attrs['kind'] = 'dict' if isinstance(value, dict) else 'tuple'
+      node.attrs['keys'] = json.dumps([k for k, v in items])
+      for k, v in items:
+        self.Write(node, k, v)
+    else:
+      node = group.create_dataset(name, data=np.asarray(value))
+      node.attrs['kind'] = 'array'
+
+  def Read(self, node):
+    """
+    Reads back a value written by Write.
+    """
+    if node.attrs['kind'] == 'array':
+      return node[()]
+
+    values = [self.Read(node[k]) for k in json.loads(node.attrs['keys'])]
+    if node.attrs['kind'] == 'dict':
+      return dict(zip(json.loads(node.attrs['keys']), values))
+    return tuple(values)
+
+class FieldStatistics:
+  """
+  We keep the minimum, maximum and maximum absolute value of each component of
+  the temporal field over blocks of the mesh, for each timestep, in a sidecar
+  file (see BuildStatistics in the analysis classes). The analyses use them
+  to bound the functionals, and skip the blocks and timesteps that cannot
+  reach a threshold or beat a running maximum.
+
+  The arrays are indexed as [component, step, block_r, (block_theta,) block_z].
+  The file records the identity of the temporal file and the region of
+  interest, and is ignored if either changed.
+  """
+
+  def __init__(self, blockShape, minimum, maximum, absmax):
+    self.block_shape = tuple(int(b) for b in blockShape)
+    self.minimum     = minimum
+    self.maximum     = maximum
+    self.absmax      = absmax
+
+  def Selection(self, block):
+    """
+    Returns the selection of the mesh covered by the block of the given indices.
+    """
+    return tuple(slice(b*size, (b+1)*size) for b, size in zip(block, self.block_shape))
+
+  def Save(self, filename, identity, region):
+    """
+    Writes the statistics in filename, with the identity of the temporal file
+    and the region of interest they were computed for.
+    """
+    with h5py.File(filename, 'w') as sidecar:
+      for name in ('minimum', 'maximum', 'absmax'):
+        sidecar.create_dataset(name, data=getattr(self, name))
+      sidecar.attrs['block_shape'] = self.block_shape
+      sidecar.attrs['identity']    = identity
+      sidecar.attrs['region']      = region or ""
+
+  @staticmethod
+  def Load(filename, identity, region):
+    """
+    Returns the statistics stored in filename, or None if there are none for
+    this version of the temporal file and this region of interest. A file that
+    cannot be read only raises a warning.
+    """
+    if not os.path.exists(filename):
+      return None
+
+    try:
+      with h5py.File(filename, 'r') as sidecar:
+        if sidecar.attrs['identity'] != identity or sidecar.attrs['region'] != (region or ""):
+          return None
+        return FieldStatistics(sidecar.attrs['block_shape'], *(sidecar[name][()] for name in ('minimum', 'maximum', 'absmax')))
+    except (OSError, KeyError) as error:
+      warnings.warn("Could not read the statistics from {}: {}".format(filename, error))
+      return None
+
+def DescribeParameter(owner, value):
+  """
+  Returns a description of a parameter of a cached method (see CachedResult).
+  The functionals are described by their names. Other callables, e.g.
+  lambdas, cannot be described, and raise a ValueError.
+  """
+  if isinstance(value, dict):
+    return "{" + ", ".join("{!r}: {}".format(k, DescribeParameter(owner, v)) for k, v in value.items()) + "}"
+  if isinstance(value, (tuple, list)):
+    return "(" + ", ".join(DescribeParameter(owner, v) for v in value) + ")"
+  if isinstance(value, np.ndarray):
+    return "array:{}{}:".format(value.dtype.str, value.shape) + hashlib.sha1(np.ascontiguousarray(value)).hexdigest()
+  if callable(value):
+    if getattr(value, '__self__', None) is not owner:
+      raise ValueError("Cannot describe the callable {!r}.".format(value))
+    return value.__name__
+
+  return repr(value)
+
+def CachedResult(method):
+  """
+  Makes a method of the analysis classes keep its results in their
+  results_cache, when they have one. The result is stored under the name of
+  the method, its parameters, the precision of the analysis and its region
+  of interest, if any. Calls that
+  cannot be described (see DescribeParameter) are not cached. With MPI, the
+  first rank looks the result up and broadcasts it; on a miss, all the ranks
+  compute it and the first one stores it. Failing to store it only raises a
+  warning.
+  """
+  @functools.wraps(method)
+  def Wrapper(self, *args, **kwargs):
+    if self.results_cache is None:
+      return method(self, *args, **kwargs)
+
+    parameters = inspect.signature(method).bind(self, *args, **kwargs)
+    parameters.apply_defaults()
+    try:
+      call = "{}.{}({}) [{}]".format(type(self).__name__, method.__name__,
+                                     ", ".join("{}={}".format(k, DescribeParameter(self, v)) for k, v in list(parameters.arguments.items())[1:]),
+                                     ", ".join(filter(None, (np.dtype(self.real_dtype).name, self.region_name))))
+    except ValueError:
+      return method(self, *args, **kwargs)
+
+    first = self.comm is None or self.comm.Get_rank() == 0
+    found, result = self.results_cache.Load(call) if first else (False, None)
+    if self.comm is not None:
+      found, result = self.comm.bcast((found, result), root=0)
+    if found:
+      return result
+
+    result = method(self, *args, **kwargs)
+    if first:
+      # -- A cache that cannot be written (e.g. in a read-only directory)
+      # -- must not lose the result that was just computed.
+      try:
+        self.results_cache.Store(call, result)
+      except OSError as error:
+        warnings.warn("Could not store {} in {}: {}".format(call, self.results_cache.filename, error))
+    return result
+
+  return Wrapper
+
 class Analysis3D:
   """
   We define some utility variables for convenient access to the data.
@@ -173,6 +739,31 @@ class Analysis3D:
   UNIT_E_FIELD   = 1.3e18*np.sqrt(4*np.pi*ALPHA)
   UNIT_B_FIELD   = UNIT_E_FIELD/SPEED_OF_LIGHT
 
+  # -- Components of the electromagnetic field, in the order in which they
+  # -- are passed to the functionals.
+  COMPONENTS     = ("Er", "Eth", "Ez", "Br", "Bth", "Bz")
+
+  # -- Number of voxels processed at once by PairDensity.
+  PAIR_DENSITY_CHUNK = 2**18
+
+  # -- Composition of the cuts through the axis: for each Cartesian component,
+  # -- the cylindrical component and its signs on the mirrored half-plane and
+  # -- on the other one.
+  SAGITTAL_CUT       = (("Er",-1,1), ("Eth",-1,1), ("Ez",1,1), ("Br",-1,1), ("Bth",-1,1), ("Bz",1,1))
+  MERIDIONAL_CUT     = (("Eth",1,-1), ("Er",-1,1), ("Ez",1,1), ("Bth",1,-1), ("Br",-1,1), ("Bz",1,1))
+
+  # -- Number of timesteps of a plane read at once.
+  PLANE_SERIES_BLOCK = 256
+
+  # -- Default number of steps read ahead by the sweeps (0 to read in turn).
+  PREFETCH_DEPTH     = 2
+
+  # -- Number of frequencies summed at once by SynthesizeTemporalField.
+  SYNTHESIS_CHUNK    = 64
+
+  # -- Default shape of the blocks of the statistics sidecar.
+  STATISTICS_BLOCK   = (16,16,16)
+
   def __init__(self,**kwargs):
     """
     We attach to the HDF5 objects and determine the number of frequency
@@ -188,6 +779,23 @@ class Analysis3D:
       driver = None
       comm   = None
 
+    self.comm             = comm
+
+    # -- Number of steps the sweeps read ahead, on a background thread.
+    self.prefetch_depth   = kwargs.get('prefetch', self.PREFETCH_DEPTH)
+
+    # -- Precision of the working arrays. The reductions, e.g. the energy
+    # -- integrals, are accumulated in double precision in any case.
+    precision             = kwargs.get('precision', 'double')
+    if precision not in PRECISIONS:
+      raise ValueError("Unknown precision {}, expected one of {}.".format(precision, tuple(PRECISIONS)))
+    self.real_dtype, self.complex_dtype = PRECISIONS[precision]
+
+    # -- Cache of the complex frequency components. It can be shared between
+    # -- analysis objects by passing the same frequency_cache.
+    self.frequency_cache  = kwargs.get('frequency_cache', None)
+    if self.frequency_cache is None:
+      self.frequency_cache = ComponentCache(kwargs.get('cache_bytes', ComponentCache.DEFAULT_BYTES))
     self.freq_file_loaded = False
     self.time_file_loaded = False
 
@@ -205,18 +813,37 @@ class Analysis3D:
         self.field_temporal    = h5py.File(kwargs['time_field'], 'r', driver=driver, comm=comm)
       else:
         self.field_temporal    = h5py.File(kwargs['time_field'], 'r')
-        self.time_file_loaded = True
+      self.time_file_loaded = True
     except (IOError, KeyError):
       pass
 
     if not self.freq_file_loaded and not self.time_file_loaded:
       raise IOError("At least one file must be loaded.")
 
+    # -- Consolidated [component, step, r, theta, z] datasets, present when the
+    # -- files were repacked by ConsolidateFieldFile.
+    self.freq_store = None
+    self.time_store = None
+    if self.freq_file_loaded and FIELD_STORE in self.field_frequency:
+      self.freq_store = OpenFieldStore(self.field_frequency)
+    if self.time_file_loaded and FIELD_STORE in self.field_temporal:
+      self.time_store = OpenFieldStore(self.field_temporal)
+
+    for store in (self.freq_store, self.time_store):
+      if store is not None and tuple(store.attrs['components']) != self.COMPONENTS:
+        raise ValueError("The field store contains the components {}, not {}.".format(tuple(store.attrs['components']),self.COMPONENTS))
+
     # -- Number of components
     if self.freq_file_loaded:
-      self.size_freq       = len(self.field_frequency['/field'])//6
+      if self.freq_store is not None:
+        self.size_freq     = self.freq_store.shape[1]
+      else:
+        self.size_freq     = len(self.field_frequency['/field'])//6
     if self.time_file_loaded:
-      self.size_time       = len(self.field_temporal['/field'])//6
+      if self.time_store is not None:
+        self.size_time     = self.time_store.shape[1]
+      else:
+        self.size_time     = len(self.field_temporal['/field'])//6
 
     # -- Size of mesh
     if self.freq_file_loaded:
@@ -235,20 +862,80 @@ class Analysis3D:
       self.size_theta      = self.coord_theta.size
       self.size_z          = self.coord_z.size
 
+    # -- Region of interest, given as roi=dict(r_max=..., z=(z_min, z_max),
+    # -- theta=indices), in the units of the coordinates, each key being
+    # -- optional. All the reads are then restricted to the points with r <= r_max,
+    # -- z_min <= z <= z_max and the given theta indices, and the coordinates,
+    # -- sizes and meshgrids are those of the cropped mesh. The angular widths
+    # -- of the cells are those of the whole mesh.
+    self.theta_widths    = np.diff(CellEdges(self.coord_theta[:], period=2*np.pi))
+    self.region          = None
+    self.region_name     = None
+    roi                  = kwargs.get('roi', None)
+    if roi is not None:
+      theta = np.unique(roi['theta']) if roi.get('theta') is not None else np.arange(self.size_theta)
+      if theta.size and theta[-1]-theta[0]+1 == theta.size:
+        theta = range(int(theta[0]), int(theta[-1])+1)
+
+      self.region          = (WindowIndices(self.coord_r[:], None, roi.get('r_max')),
+                              theta,
+                              WindowIndices(self.coord_z[:], *roi.get('z', (None, None))))
+      if not all(len(axis) for axis in self.region):
+        raise ValueError("The region of interest {} contains no point of the mesh.".format(roi))
+
+      self.region_name     = "roi(r={}, theta={}, z={})".format(*(axis if isinstance(axis, range) else axis.tolist() for axis in self.region))
+      self.coord_r         = self.coord_r[:][np.asarray(self.region[0])]
+      self.coord_theta     = self.coord_theta[:][np.asarray(self.region[1])]
+      self.coord_z         = self.coord_z[:][np.asarray(self.region[2])]
+      self.theta_widths    = self.theta_widths[np.asarray(self.region[1])]
+      self.size_r          = self.coord_r.size
+      self.size_theta      = self.coord_theta.size
+      self.size_z          = self.coord_z.size
 
     self.dimensions_mesh = np.array([self.size_r, self.size_theta, self.size_z])
-
-    # -- Cartesian meshgrid.
-    self.R,  self.Th     = np.meshgrid(self.coord_r[:]*self.UNIT_LENGTH, self.coord_theta[:])
-    self.Rz, self.Z      = np.meshgrid(self.coord_r[:]*self.UNIT_LENGTH, self.coord_z[:]*self.UNIT_LENGTH)
-    self.X_meshgrid      = self.R*np.cos(self.Th)
-    self.Y_meshgrid      = self.R*np.sin(self.Th)
-    self.R_meshgrid      = self.Rz
-    self.Z_meshgrid      = self.Z
-
-    # -- Sagittal/meridional meshgrids.
-    self.r_axial         = np.concatenate([-self.coord_r[:][:0:-1], self.coord_r[:]])
-    self.R_axial_meshgrid,self.Z_axial_meshgrid= np.meshgrid(self.r_axial*self.UNIT_LENGTH,self.coord_z[:]*self.UNIT_LENGTH)
+    self.energy_weights  = None
+    self.cell_volumes    = None
+
+    # -- Work arrays reused by the functionals across the time loops.
+    self.workspace       = Workspace()
+
+    # -- Interpolations of the FFT frequencies on the spectral grid, keyed by
+    # -- the number of samples and the time step (see ComputeLocalSpectrum).
+    self.spectrum_plans  = {}
+
+    # -- Persistent cache of the derived results, enabled with
+    # -- results_cache=True (next to the input files) or a file name.
+    self.results_cache   = None
+    if kwargs.get('results_cache', False):
+      inputs = []
+      if self.time_file_loaded:
+        inputs.append(self.field_temporal.filename)
+      if self.freq_file_loaded:
+        inputs.append(self.field_frequency.filename)
+      cacheFile = kwargs['results_cache']
+      self.results_cache = ResultsCache(inputs, None if cacheFile is True else cacheFile)
+
+    # -- Per-block statistics of the temporal field, enabled with
+    # -- statistics=True (next to the temporal file) or a file name. They are
+    # -- written by BuildStatistics, and used when they match the file.
+    self.statistics      = None
+    self.statistics_file = None
+    if kwargs.get('statistics', False) and self.time_file_loaded:
+      statsFile = kwargs['statistics']
+      self.statistics_file = os.path.splitext(self.field_temporal.filename)[0]+".stats.h5" if statsFile is True else statsFile
+      # -- The first rank reads them, so that all the ranks agree on whether
+      # -- they are used.
+      if self.comm is None or self.comm.Get_rank() == 0:
+        self.statistics = FieldStatistics.Load(self.statistics_file, FileIdentity([self.field_temporal.filename]), self.region_name)
+      if self.comm is not None:
+        self.statistics = self.comm.bcast(self.statistics, root=0)
+
+    # -- Trigonometric tables used to rotate the cylindrical components.
+    self.cos_theta       = np.cos(self.coord_theta[:]).astype(self.real_dtype)
+    self.sin_theta       = np.sin(self.coord_theta[:]).astype(self.real_dtype)
+
+    # -- The meshgrids (R, Th, X_meshgrid, R_axial_meshgrid, ...) are built
+    # -- on first use, see the Meshgrids section.
 
     # -- Temporal information
     if self.freq_file_loaded:
@@ -272,62 +959,800 @@ class Analysis3D:
     if time_file_loaded:
       self.field_temporal.close()
 
+  # -------------------------------- Meshgrids -------------------------------- #
+  # -- Cartesian meshgrid, as (theta, r) and (z, r) arrays, in meters.
+  @functools.cached_property
+  def R(self):
+    return np.meshgrid(self.coord_r[:]*self.UNIT_LENGTH, self.coord_theta[:])[0]
+
+  @functools.cached_property
+  def Th(self):
+    return np.meshgrid(self.coord_r[:]*self.UNIT_LENGTH, self.coord_theta[:])[1]
+
+  @functools.cached_property
+  def Rz(self):
+    return np.meshgrid(self.coord_r[:]*self.UNIT_LENGTH, self.coord_z[:]*self.UNIT_LENGTH)[0]
+
+  @functools.cached_property
+  def Z(self):
+    return np.meshgrid(self.coord_r[:]*self.UNIT_LENGTH, self.coord_z[:]*self.UNIT_LENGTH)[1]
+
+  @functools.cached_property
+  def X_meshgrid(self):
+    return self.R*np.cos(self.Th)
+
+  @functools.cached_property
+  def Y_meshgrid(self):
+    return self.R*np.sin(self.Th)
+
+  @property
+  def R_meshgrid(self):
+    return self.Rz
+
+  @property
+  def Z_meshgrid(self):
+    return self.Z
+
+  # -- Sagittal/meridional meshgrids.
+  @functools.cached_property
+  def r_axial(self):
+    return np.concatenate([-self.coord_r[:][:0:-1], self.coord_r[:]])
+
+  @functools.cached_property
+  def R_axial_meshgrid(self):
+    return np.meshgrid(self.r_axial*self.UNIT_LENGTH,self.coord_z[:]*self.UNIT_LENGTH)[0]
+
+  @functools.cached_property
+  def Z_axial_meshgrid(self):
+    return np.meshgrid(self.r_axial*self.UNIT_LENGTH,self.coord_z[:]*self.UNIT_LENGTH)[1]
+
   def GetFrequencyComponent(self,comp,freq):
     """
-    Returns the freq-th frequency component of the electromagnetic field.
+    Returns the freq-th frequency component of the electromagnetic field. The
+    components are kept in the frequency_cache, so the returned array is
+    read-only and must be copied before being modified.
+    """
+    return self.frequency_cache.Get(self.FrequencyCacheKey(comp, freq), lambda: self.ReadFrequencyComponent(comp, freq))
+
+  def FrequencyCacheKey(self,comp,freq):
+    """
+    Returns the key of the freq-th frequency component comp in the
+    frequency_cache.
+    """
+    return (self.field_frequency.filename, comp, freq, self.complex_dtype, self.region_name)
+
+  def GetFrequencySelection(self,comp,freq,selection):
+    """
+    Returns a selection (a tuple of indices over the mesh) of the freq-th
+    frequency component comp. It is sliced from the component when the whole
+    of it is in the frequency_cache. Otherwise, only the selection is read,
+    and it is kept in the cache under its own key. Either way, the returned
+    array is read-only.
+    """
+    key    = self.FrequencyCacheKey(comp, freq)
+    cached = self.frequency_cache.Lookup(key)
+    if cached is not None:
+      return cached[selection]
+
+    return self.frequency_cache.Get(key+(repr(selection),), lambda: self.ReadFrequencyComponent(comp, freq, selection))
+
+  def FileSelection(self,selection=()):
+    """
+    Maps a selection (a tuple of indices over the mesh) to the corresponding
+    selection in the files, which differ when a region of interest is set.
+    """
+    if self.region is None:
+      return selection
+
+    return ComposeSelection(self.region, selection)
+
+  def ReadFrequencyComponent(self,comp,freq,selection=()):
+    """
+    Reads a selection (a tuple of indices over the mesh, the whole mesh by
+    default) of the freq-th frequency component of the electromagnetic field
+    from the file, bypassing the cache.
     """
+    selection = self.FileSelection(selection)
+    if self.freq_store is not None:
+      return self.freq_store[(self.COMPONENTS.index(comp),freq)+selection].astype(self.complex_dtype, copy=False)
+
     amplitude = self.field_frequency['/field/{}-{}/amplitude'.format(comp,freq)]
     phase     = self.field_frequency['/field/{}-{}/phase'.format(comp,freq)]
-    return np.array(amplitude[:]*np.exp(1j*phase[:]), dtype=complex)
+    return np.array(amplitude[selection]*np.exp(1j*phase[selection]), dtype=self.complex_dtype)
 
   def GetTemporalComponent(self,comp,time):
     """
-    Returns the time-th temporal component of the electromagnetic field.
+    Returns the time-th temporal component of the electromagnetic field. This is
+    the HDF5 dataset itself, except for consolidated files or when a region of
+    interest is set, where the array is read.
+    """
+    if self.time_store is not None:
+      return self.time_store[(self.COMPONENTS.index(comp),time)+self.FileSelection()].astype(self.real_dtype, copy=False)
+
+    dataset = self.field_temporal['/field/{}-{}'.format(comp,time)]
+    return dataset if self.region is None else dataset[self.FileSelection()]
+
+  def ReadTemporalComponent(self,comp,timeIdx,out,selection=()):
+    """
+    Reads a selection (a tuple of slices over the mesh) of the time-th temporal
+    component comp directly into out, from either file layout.
+    """
+    selection = self.FileSelection(selection)
+    if self.time_store is not None:
+      self.time_store.read_direct(out, source_sel=(self.COMPONENTS.index(comp),timeIdx)+selection)
+    else:
+      self.field_temporal['/field/{}-{}'.format(comp,timeIdx)].read_direct(out, source_sel=selection or None)
+
+  def AllocateTemporalBundle(self):
+    """
+    Allocates a block that holds the six components of the field at a single
+    timestep. The block is indexed as [component, r, theta, z], in the order
+    given by COMPONENTS, so that it can be unpacked directly into any of the
+    functionals, i.e. emFunc(*bundle).
+    """
+    return np.empty((len(self.COMPONENTS),self.size_r,self.size_theta,self.size_z), dtype=self.real_dtype)
+
+  def GetTemporalBundle(self,timeIdx,bundle=None):
+    """
+    Reads the six components of the time-th temporal field into bundle, which
+    is allocated if none is given. Each dataset is read exactly once.
+    """
+    if bundle is None:
+      bundle = self.AllocateTemporalBundle()
+
+    for c, comp in enumerate(self.COMPONENTS):
+      self.ReadTemporalComponent(comp, timeIdx, bundle[c])
+
+    return bundle
+
+  def GetTemporalPlaneBundle(self,timeIdx,z_idx):
+    """
+    Reads the six components of the time-th temporal field in the plane z_idx
+    only. The block is indexed as [component, r, theta, 1].
     """
-    return self.field_temporal['/field/{}-{}'.format(comp,time)]
+    bundle = np.empty((len(self.COMPONENTS),self.size_r,self.size_theta,1), dtype=self.real_dtype)
+    for c, comp in enumerate(self.COMPONENTS):
+      self.ReadTemporalComponent(comp, timeIdx, bundle[c], np.s_[:,:,z_idx:z_idx+1])
+
+    return bundle
+
+  def AllocateRegionBundle(self,selection):
+    """
+    Allocates a block that holds the six components of the field in a
+    selection of the mesh, as read by GetTemporalRegionBundle.
+    """
+    shape = np.empty((self.size_r,self.size_theta,self.size_z), dtype=bool)[selection].shape
+    return np.empty((len(self.COMPONENTS),)+shape, dtype=self.real_dtype)
+
+  def GetTemporalRegionBundle(self,timeIdx,selection,bundle=None):
+    """
+    Reads the six components of the time-th temporal field in a selection of
+    the mesh (a tuple of slices, or of an index array over theta), into bundle
+    if one is given. The block is indexed as [component, r, theta, z].
+    """
+    if bundle is None:
+      bundle = self.AllocateRegionBundle(selection)
+
+    for c, comp in enumerate(self.COMPONENTS):
+      self.ReadTemporalComponent(comp, timeIdx, bundle[c], selection)
+
+    return bundle
+
+  def GetTemporalPlaneSeries(self,z_idx,timeIndices=None,out=None):
+    """
+    Returns the six components of the field in the plane z_idx for the given
+    timesteps (all of them if none are given), as a block indexed as
+    [component, r, theta, t]. For consolidated files, the block is read with a
+    single hyperslab. If out is given, e.g. a view of a larger block, the
+    components are read into it one step at a time instead, so that no other
+    array of its size is allocated.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+
+    if out is None and self.time_store is not None and isinstance(timeIndices, range) and timeIndices.step == 1:
+      block = self.time_store[(slice(None),slice(timeIndices.start,timeIndices.stop))+self.FileSelection(np.s_[:,:,z_idx])]
+      return np.ascontiguousarray(np.moveaxis(block, 1, -1), dtype=self.real_dtype)
+
+    block = np.empty((len(self.COMPONENTS),self.size_r,self.size_theta,len(timeIndices)), dtype=self.real_dtype) if out is None else out
+    plane = np.empty((self.size_r,self.size_theta), dtype=self.real_dtype)
+    for n, i in enumerate(timeIndices):
+      for c, comp in enumerate(self.COMPONENTS):
+        self.ReadTemporalComponent(comp, i, plane, np.s_[:,:,z_idx])
+        block[c,:,:,n] = plane
+
+    return block
+
+  def GetFrequencyPlaneSeries(self,z_idx):
+    """
+    Returns the six components of the field in the plane z_idx for all the
+    frequencies, as a block indexed as [component, r, theta, omega]. For
+    consolidated files, the block is read with a single hyperslab. Otherwise,
+    the plane of each component is obtained with GetFrequencySelection, so
+    that extracting it again is served from the frequency_cache.
+    """
+    if self.freq_store is not None:
+      block = self.freq_store[(slice(None),slice(None))+self.FileSelection(np.s_[:,:,z_idx])]
+      return np.ascontiguousarray(np.moveaxis(block, 1, -1), dtype=self.complex_dtype)
+
+    block = np.empty((len(self.COMPONENTS),self.size_r,self.size_theta,self.size_freq), dtype=self.complex_dtype)
+    for i in range(self.size_freq):
+      for c, comp in enumerate(self.COMPONENTS):
+        block[c,:,:,i] = self.GetFrequencySelection(comp, i, np.s_[:,:,z_idx])
+
+    return block
+
+  def SpectralTimes(self):
+    """
+    Returns the times (in s) resolved by the spectral components: one period
+    1/dnu, for the smallest spacing dnu of the frequencies, centred on zero and
+    sampled at the Nyquist rate of the highest frequency.
+    """
+    nu = self.omega[:]
+    if nu.size < 2:
+      raise ValueError("The times are required to synthesize the field from a single frequency.")
+
+    period = 1.0/np.min(np.diff(nu))
+    size   = int(np.ceil(2.0*nu[-1]*period))
+    return (np.arange(size)-size//2)*(period/size)
+
+  @CachedResult
+  def SynthesizeTemporalField(self,times=None,region=(),components=None,chunkSize=None):
+    r"""
+    Synthesizes the temporal field from the spectral components of the
+    frequency file, at the given times (in s). They default to those of the
+    temporal file or, if it is not loaded, to those of SpectralTimes. The field
+    is synthesized in a region of the mesh. region is a tuple of indices or slices
+    over (r, theta, z), e.g. np.s_[:,:,z_idx] for a plane, the whole mesh by default.
+
+    The spectral components are taken as the one-sided Fourier transform of
+    the field, i.e.
+    ..math::
+        E(t) = 2 \Re \int_0^\infty \tilde{E}(\nu) e^{-2i\pi\nu t} d\nu,
+
+    where the integral is a midpoint sum over the frequencies of the file.
+    Since these need not start at zero nor be evenly spaced, the inverse
+    transform is done by matrix products with the phase factors rather than by
+    an inverse FFT. The frequencies are streamed by chunks of chunkSize
+    (SYNTHESIS_CHUNK by default) so that the memory stays bounded, and the
+    chunks are split between the MPI ranks.
+
+    Returns a block indexed as [component, region..., t], with the components
+    in the order of components (COMPONENTS by default).
+    """
+    if times is None:
+      times = self.time[:] if self.time_file_loaded else self.SpectralTimes()
+    if components is None:
+      components = self.COMPONENTS
+    if chunkSize is None:
+      chunkSize = self.SYNTHESIS_CHUNK
+
+    times   = np.asarray(times, dtype=float)
+    nu      = self.omega[:]
+    weights = np.diff(CellEdges(nu))
+    shape   = np.empty((self.size_r,self.size_theta,self.size_z), dtype=bool)[region].shape
+    field   = np.zeros((len(components)*int(np.prod(shape)),times.size), dtype=self.real_dtype)
+
+    def ReadChunk(chunk, buffer):
+      spectra = np.empty((len(chunk),len(components))+shape, dtype=self.complex_dtype)
+      for n, i in enumerate(chunk):
+        for c, comp in enumerate(components):
+          spectra[n,c] = self.ReadFrequencyComponent(comp, i, region)
+      return spectra.reshape(len(chunk),-1)
+
+    chunks = [range(start, min(start+chunkSize, nu.size)) for start in range(0, nu.size, chunkSize)]
+    local  = [chunks[n] for n in self.DistributeIndices(len(chunks))]
+    for chunk, spectra in self.Sweep(ReadChunk, local, [None]*(self.prefetch_depth+1)):
+      # -- Re(S^T P) for the phase factors P of this chunk of frequencies.
+      phase  = weights[chunk,np.newaxis]*np.exp(-2j*np.pi*nu[chunk,np.newaxis]*times[np.newaxis,:])
+      field += np.dot(spectra.real.T, phase.real.astype(self.real_dtype))
+      field -= np.dot(spectra.imag.T, phase.imag.astype(self.real_dtype))
+    self.ReduceSum(field)
+
+    field *= 2.0
+    return field.reshape((len(components),)+shape+(times.size,))
+
+  def IterateTemporalBundles(self,timeIndices=None):
+    """
+    Iterates over the given timesteps (all of them if none are given) and
+    yields (timeIdx, bundle) pairs. The timesteps are prefetched into a ring
+    of prefetch_depth+1 bundles, which are reused in turn, so the content of a
+    bundle is only valid until the next iteration.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+
+    buffers = [self.AllocateTemporalBundle() for n in range(self.prefetch_depth+1)]
+    yield from self.Sweep(self.GetTemporalBundle, timeIndices, buffers)
+
+  def Sweep(self,read,indices,buffers):
+    """
+    Iterates over indices and yields (i, read(i, buffer)) pairs, cycling
+    through the given buffers. The next prefetch_depth steps are read on a
+    background thread while the caller processes the current one (see
+    Prefetch). With prefetch_depth=0, the steps are simply read in turn, into
+    the first buffer.
+    """
+    if self.prefetch_depth == 0:
+      for i in indices:
+        yield i, read(i, buffers[0])
+      return
+
+    yield from Prefetch(read, indices, buffers)
+
+  def DistributeIndices(self,loopsize):
+    """
+    Returns the range of the indices of a loop of size loopsize that are
+    processed by this rank. The loop is split in contiguous blocks whose sizes
+    differ by at most one (see vphys.StaticPartition). Without MPI, the whole
+    loop is returned.
+    """
+    if self.comm is None:
+      return range(loopsize)
+
+    return vphys.StaticPartition(np.ones(loopsize), self.comm.Get_size())[self.comm.Get_rank()]
+
+  def ReduceSum(self,*arrays):
+    """
+    Sums the given arrays over all the ranks, in place. The sweeps fill the
+    elements they own and leave the others to zero, so that this combines
+    their results. Without MPI, this does nothing.
+    """
+    if self.comm is not None:
+      from mpi4py import MPI
+      for array in arrays:
+        self.comm.Allreduce(MPI.IN_PLACE, array, op=MPI.SUM)
+
+    return arrays
+
+  def ReduceMax(self,value):
+    """
+    Returns the maximum of the scalar value over all the ranks. Without MPI,
+    this returns value.
+    """
+    if self.comm is not None:
+      from mpi4py import MPI
+      value = self.comm.allreduce(value, op=MPI.MAX)
+
+    return value
+
+  def EvaluateFunctionals(self,bundle,*functionals):
+    """
+    Evaluates any number of functionals on the same timestep bundle and
+    returns the list of their values.
+    """
+    return [func(*bundle) for func in functionals]
 
   def FindMaximumValues(self,emFunc=None):
     """
     This finds the maximum value of a given function of the electromagnetic
     field. If none, it computes the maximum electric energy density in SI units.
     """
+    if (emFunc==None):
+      emFunc = self.ElectricEnergyDensity
 
-    maxIdx     = np.zeros((self.size_time), dtype=int)
-    maxIndices = np.zeros((self.size_time), dtype=(int,3))
-    maxValue   = np.zeros((self.size_time))
+    if self.FunctionalBound(emFunc, 0) is not None:
+      return self.ScanMaximumValues(emFunc)
 
+    return self.ComputeReductions({"max": (emFunc, "max")})["max"]
+
+  def FindPeak(self,emFunc=None,timeStride=4,spaceStride=2,radius=1,candidates=4):
+    """
+    Quick-look search of the maximum of emFunc (the electric energy density by
+    default) over all the timesteps, in two stages. The functional is first
+    evaluated on a subsample that keeps one timestep in timeStride and one
+    point in spaceStride along each axis of the mesh. The maxima of the
+    candidates best subsampled timesteps are then refined at full resolution,
+    within radius strides of them in time and in space (theta wrapping
+    around).
+
+    This reads a small fraction of the data read by FindMaximumValues, but can
+    miss maxima that are narrower than the strides. When the statistics bound
+    emFunc (see FunctionalBound), the search is exact instead: the timesteps
+    and their blocks are read by decreasing bound, until none can beat the
+    maximum found so far, and the strides are not used. Returns the timestep, the
+    (r_idx, theta_idx, z_idx) indices and the value of the maximum.
+    """
     if (emFunc==None):
       emFunc = self.ElectricEnergyDensity
 
-    for i in range(self.size_time):
+    if self.FunctionalBound(emFunc, 0) is not None:
+      return self.ScanPeak(emFunc)
+
+    return self.StridedPeak(emFunc, timeStride, spaceStride, radius, candidates)
+
+  @CachedResult
+  def StridedPeak(self,emFunc,timeStride,spaceStride,radius,candidates):
+    """
+    The approximate two-stage search of FindPeak, which does not use the
+    statistics.
+    """
+    # -- Stage 1: maxima of the subsampled timesteps, on the subsampled mesh.
+    coarse  = np.s_[::spaceStride,::spaceStride,::spaceStride]
+    steps   = range(0, self.size_time, timeStride)
+    indices = np.zeros((len(steps),3), dtype=int)
+    values  = np.zeros((len(steps)))
+    buffers = [self.AllocateRegionBundle(coarse) for n in range(self.prefetch_depth+1)]
+
+    local   = self.DistributeIndices(len(steps))
+    with self.SampledTheta(np.arange(self.size_theta)[coarse[1]]):
+      for n, (i, bundle) in zip(local, self.Sweep(lambda i, buffer: self.GetTemporalRegionBundle(i, coarse, buffer),
+                                                  [steps[n] for n in local], buffers)):
+        value      = np.broadcast_to(emFunc(*bundle), bundle.shape[1:])
+        indices[n] = np.unravel_index(np.argmax(value), value.shape)
+        values[n]  = value[tuple(indices[n])]
+    self.ReduceSum(indices, values)
+    indices *= spaceStride
+
+    # -- Stage 2: full resolution around the best candidates. The windows of
+    # -- neighbouring candidates can coincide, and are then read only once.
+    window = radius*spaceStride
+    tasks  = []
+    seen   = set()
+    for n in np.argsort(values)[::-1][:candidates]:
+      r_idx, theta_idx, z_idx = indices[n]
+      selection = (slice(max(r_idx-window,0), r_idx+window+1),
+                   np.unique(np.arange(theta_idx-window, theta_idx+window+1) % self.size_theta),
+                   slice(max(z_idx-window,0), z_idx+window+1))
+      for i in range(max(steps[n]-radius*timeStride,0), min(steps[n]+radius*timeStride+1,self.size_time)):
+        key = (i, selection[0].start, selection[0].stop, tuple(selection[1]), selection[2].start, selection[2].stop)
+        if key not in seen:
+          seen.add(key)
+          tasks.append((i, selection))
+
+    indices = np.zeros((len(tasks),3), dtype=int)
+    values  = np.zeros((len(tasks)))
+    local   = self.DistributeIndices(len(tasks))
+    for n, ((i, selection), bundle) in zip(local, self.Sweep(lambda task, buffer: self.GetTemporalRegionBundle(*task),
+                                                             [tasks[n] for n in local], [None]*(self.prefetch_depth+1))):
+      with self.SampledTheta(selection[1]):
+        value    = np.broadcast_to(emFunc(*bundle), bundle.shape[1:])
+      r_idx, theta_idx, z_idx = np.unravel_index(np.argmax(value), value.shape)
+      indices[n] = (selection[0].start+r_idx, selection[1][theta_idx], selection[2].start+z_idx)
+      values[n]  = value[r_idx,theta_idx,z_idx]
+    self.ReduceSum(indices, values)
+
+    best = np.argmax(values)
+    return tasks[best][0], tuple(int(idx) for idx in indices[best]), values[best]
+
+  def ComputeFocalVolume(self, emFunc=None, fraction=0.5, maxValues=None, stopAfterPeak=False):
+    """
+    Computes, for each timestep, the focal volume: the volume (in m^3) of the
+    cells in which emFunc (the electric energy density by default) is at least
+    fraction times its global maximum. maxValues are the maxima of emFunc at
+    each timestep, as returned by FindMaximumValues. If they are not given,
+    FindMaximumValues is called first, which takes its own sweep (unless it is
+    cached or uses the statistics): the savings below only pay off in full
+    when maxValues are passed in.
+
+    The volume vanishes at the timesteps whose maximum is below the level, so
+    only the other ones are read, and the volumes of the former are zero. With
+    stopAfterPeak, the pass stops after the timestep of the global maximum,
+    whose volume is usually the one of interest, and the volumes of the later
+    timesteps, which are not evaluated, are NaN. When the statistics bound
+    emFunc, only the blocks that can reach the level are read (see
+    ScanFocalVolumes).
+    """
+    if (emFunc==None):
+      emFunc = self.ElectricEnergyDensity
+    if maxValues is None:
+      maxIndices, maxValues = self.FindMaximumValues(emFunc)
+
+    peak    = np.argmax(maxValues)
+    level   = fraction*maxValues[peak]
+    last    = peak+1 if stopAfterPeak else len(maxValues)
+    steps   = [i for i in range(last) if maxValues[i] >= level]
+
+    volumes = np.zeros((len(maxValues)))
+    volumes[last:] = np.nan
+    if self.FunctionalBound(emFunc, 0) is not None:
+      volumes[steps] = self.ScanFocalVolumes(emFunc, level, steps)
+    else:
+      volumes[steps] = self.ComputeReductions({"volume": (emFunc, "volume", level)}, timeIndices=steps)["volume"]
+    return volumes
+
+  def BuildStatistics(self,blockShape=None):
+    """
+    Sweeps the temporal file once and writes the minimum, maximum and maximum
+    absolute value of each component over blocks of blockShape points
+    (STATISTICS_BLOCK by default), for each timestep, in the statistics file
+    (see FieldStatistics), which the next analyses of the same file use. Returns
+    the statistics.
+    """
+    if blockShape is None:
+      blockShape = self.STATISTICS_BLOCK
+    if self.statistics_file is None:
+      self.statistics_file = os.path.splitext(self.field_temporal.filename)[0]+".stats.h5"
+
+    blocks  = tuple(-(-size//block) for size, block in zip(self.dimensions_mesh, blockShape))
+    minimum = np.zeros((len(self.COMPONENTS),self.size_time)+blocks)
+    maximum = np.zeros((len(self.COMPONENTS),self.size_time)+blocks)
+    for i, bundle in self.IterateTemporalBundles(self.DistributeIndices(self.size_time)):
       if (i % 100 == 0):
-        print("Analyzing temporal component {}/{}".format(i,self.size_time))
+        print("Indexing temporal component {}/{}".format(i,self.size_time))
+      minimum[:,i] = BlockReduce(np.minimum, bundle, blockShape)
+      maximum[:,i] = BlockReduce(np.maximum, bundle, blockShape)
+    self.ReduceSum(minimum, maximum)
+
+    self.statistics = FieldStatistics(blockShape, minimum, maximum, np.maximum(maximum, -minimum))
+    if self.comm is None or self.comm.Get_rank() == 0:
+      self.statistics.Save(self.statistics_file, FileIdentity([self.field_temporal.filename]), self.region_name)
+    return self.statistics
+
+  def FunctionalBound(self,emFunc,timeIdx):
+    """
+    Returns an upper bound of emFunc on each block of the statistics at the
+    time-th timestep, or None if there are no statistics or if emFunc is not
+    one of the functionals we know how to bound. The bounds are slightly
+    widened to absorb the rounding of the single precision.
+    """
+    if self.statistics is None:
+      return None
+
+    absmax = self.statistics.absmax[:,timeIdx]
+    if emFunc in (self.ElectricEnergyDensity, self.MagneticEnergyDensity, self.ElectromagneticEnergyDensity,
+                  self.Er, self.Eth, self.Ez, self.Br, self.Bth, self.Bz, self.EzAbsCart, self.BzAbsCart):
+      # -- These grow with the magnitude of each component.
+      bound = emFunc(*absmax)
+    elif emFunc in (self.ExAbsCart, self.EyAbsCart):
+      bound = np.hypot(absmax[0], absmax[1])
+    elif emFunc in (self.BxAbsCart, self.ByAbsCart):
+      bound = np.hypot(absmax[3], absmax[4])
+    elif emFunc == self.PairDensity:
+      # -- The invariants of PairDensity satisfy E <= |E| and H <= |B|, and the
+      # -- density grows with both, so that it is bounded by its value for
+      # -- parallel fields of magnitudes |E| and |B|, whose invariants are
+      # -- exactly |E| and |B|.
+      E     = np.sqrt(np.sum(np.square(absmax[:3]), axis=0))
+      B     = np.sqrt(np.sum(np.square(absmax[3:]), axis=0))
+      zero  = np.zeros_like(E)
+      bound = self.PairDensity(E, zero, zero, B, zero, zero)
+    else:
+      return None
+    return bound*(1+1e-5)
+
+  def ScanBlocks(self,emFunc,timeIdx,floor,best=None):
+    """
+    Evaluates emFunc on the blocks of the time-th timestep that can beat
+    floor, by decreasing bound, raising floor to the largest value found so
+    far. best is the (timestep, indices) key of the maximum that reached
+    floor, if it is known. A value equal to floor only beats it at a lower
+    key, so that ties go to the lowest timestep and indices, as with a full
+    sweep. Returns the key and the value of the maximum, or (None, floor) if
+    no block can beat floor.
+    """
+    bound = self.FunctionalBound(emFunc, timeIdx)
+    found = None
+    for block in np.argsort(-bound, axis=None, kind='stable'):
+      selection = self.statistics.Selection(np.unravel_index(block, bound.shape))
+      if bound.flat[block] < floor:
+        break
+      if bound.flat[block] == floor and best is not None and (timeIdx,)+tuple(s.start for s in selection) >= best:
+        continue
 
-      func_value  = emFunc(self.GetTemporalComponent("Er", i),
-                           self.GetTemporalComponent("Eth", i),
-                           self.GetTemporalComponent("Ez", i),
-                           self.GetTemporalComponent("Br", i),
-                           self.GetTemporalComponent("Bth", i),
-                           self.GetTemporalComponent("Bz", i))
+      bundle    = self.GetTemporalRegionBundle(timeIdx, selection)
+      with self.SampledTheta(selection[1]):
+        value   = emFunc(*bundle)
+      blockMax  = np.unravel_index(np.argmax(value), value.shape)
+      key       = (timeIdx,)+tuple(s.start+idx for s, idx in zip(selection, blockMax))
+      if value[blockMax] > floor or (value[blockMax] == floor and (best is None or key < best)):
+        floor   = value[blockMax]
+        found   = best = key
 
-      maxIdx[i]    = np.argmax(func_value)
-      maxIndices[i]= np.unravel_index(maxIdx[i],(self.size_r,self.size_theta,self.size_z))
-      maxValue[i]  = func_value[maxIndices[i][0],maxIndices[i][1],maxIndices[i][2]]
+    return found, floor
+
+  @CachedResult
+  def ScanMaximumValues(self,emFunc):
+    """
+    Computes the maxima of FindMaximumValues with the statistics: at each
+    timestep, the blocks are read by decreasing bound on emFunc, until none
+    can beat the maximum found so far (see ScanBlocks).
+    """
+    maxIndices = np.zeros((self.size_time,3), dtype=int)
+    maxValue   = np.zeros((self.size_time))
+    for i in self.DistributeIndices(self.size_time):
+      if (i % 100 == 0):
+        print("Analyzing temporal component {}/{}".format(i,self.size_time))
+      best, maxValue[i] = self.ScanBlocks(emFunc, i, -np.inf)
+      maxIndices[i]     = best[1:]
+    self.ReduceSum(maxIndices, maxValue)
 
     return maxIndices, maxValue
 
-  def FindTemporalFocalPlane(self, maxFunc=None, storeFunc=None):
+  @CachedResult
+  def ScanPeak(self,emFunc):
+    """
+    Finds the maximum of emFunc over all the timesteps with the statistics.
+    The timesteps are visited by decreasing bound, dealt round-robin to the
+    ranks, which share the largest maximum found so far after each round. The
+    search stops as soon as no remaining timestep can beat it. Ties go to the
+    lowest timestep and indices, as with a full sweep. Returns the timestep,
+    the indices and the value of the maximum, as FindPeak.
+    """
+    bounds  = np.array([np.max(self.FunctionalBound(emFunc, i)) for i in range(self.size_time)])
+    order   = np.argsort(-bounds, kind='stable')
+    rank, nprocs = (0, 1) if self.comm is None else (self.comm.Get_rank(), self.comm.Get_size())
+
+    # -- Each rank records its maximum at its timestep, the others stay zero.
+    # -- floor is the largest maximum over all the ranks, and value the one of
+    # -- this rank, found at best.
+    found   = np.zeros((self.size_time))
+    indices = np.zeros((self.size_time,3), dtype=int)
+    values  = np.zeros((self.size_time))
+    best    = None
+    value   = -np.inf
+    floor   = -np.inf
+    for start in range(0, self.size_time, nprocs):
+      if bounds[order[start]] < floor:
+        break
+      if start+rank < self.size_time:
+        i = order[start+rank]
+        if bounds[i] >= floor:
+          key, floor = self.ScanBlocks(emFunc, i, floor, best if value == floor else None)
+          if key is not None:
+            best, value = key, floor
+      floor = self.ReduceMax(floor)
+    if best is not None:
+      found[best[0]], indices[best[0]], values[best[0]] = 1.0, best[1:], value
+    self.ReduceSum(found, indices, values)
+
+    best = np.flatnonzero(found)[np.argmax(values[found > 0])]
+    return int(best), tuple(int(idx) for idx in indices[best]), values[best]
+
+  @CachedResult
+  def ScanFocalVolumes(self,emFunc,level,timeIndices):
+    """
+    Computes the volumes of the cells in which emFunc is at least level, as
+    the "volume" reduction of ComputeReductions, for the given timesteps.
+    Only the blocks whose bound reaches the level are read.
+    """
+    volumes = np.zeros((len(timeIndices)))
+    cells   = self.GetCellVolumes()
+    for n in self.DistributeIndices(len(timeIndices)):
+      bound = self.FunctionalBound(emFunc, timeIndices[n])
+      for block in zip(*np.nonzero(bound >= level)):
+        selection = self.statistics.Selection(block)
+        bundle    = self.GetTemporalRegionBundle(timeIndices[n], selection)
+        with self.SampledTheta(selection[1]):
+          value   = emFunc(*bundle)
+        volumes[n] += np.sum(cells[selection], where=value >= level, dtype=np.float64)
+    self.ReduceSum(volumes)
+
+    return volumes
+
+  @CachedResult
+  def ComputeReductions(self,reductions,timeIndices=None):
+    """
+    Computes several reductions of functionals of the field in a single pass
+    over the temporal file, for the given timesteps (all of them if none are
+    given). reductions maps names of our choosing to tuples
+    (functional, kind[, argument]), where kind is one of
+      - "max":      the (maxIndices, maxValue) pair of FindMaximumValues,
+      - "integral": the volume integral of the functional, in grid units,
+      - "plane":    the functional on the plane z_idx=argument, as an
+                    (r, theta, time) array,
+      - "point":    the time series of the functional at the point
+                    argument=(r_idx, theta_idx, z_idx),
+      - "volume":   the volume (in m^3) of the cells in which the functional
+                    is at least argument, see GetCellVolumes.
+    Each timestep is read once, and each functional is evaluated once per
+    timestep, however many reductions use it. Returns a dictionary with the
+    same keys as reductions.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+    size = len(timeIndices)
+
+    results = {}
+    for name, (func, kind, *argument) in reductions.items():
+      if kind == "max":
+        results[name] = (np.zeros((size,3), dtype=int), np.zeros((size)))
+      elif kind == "plane":
+        results[name] = np.zeros((self.size_r,self.size_theta,size), dtype=self.real_dtype)
+      elif kind in ("integral", "point", "volume"):
+        results[name] = np.zeros((size))
+      else:
+        raise ValueError("Unknown reduction {} for {}.".format(kind, name))
+
+    if any(kind == "integral" for func, kind, *argument in reductions.values()):
+      weights = self.GetEnergyWeights()
+    if any(kind == "volume" for func, kind, *argument in reductions.values()):
+      volumes = self.GetCellVolumes()
+
+    # -- Each functional that accepts out= writes its values in its own work
+    # -- array, which is reused from one timestep to the next.
+    outputs = {}
+    for func, kind, *argument in reductions.values():
+      if func not in outputs:
+        outputs[func] = "value{}".format(len(outputs)) if "out" in inspect.signature(func).parameters else None
+
+    local = self.DistributeIndices(size)
+    for n, (i, bundle) in zip(local, self.IterateTemporalBundles([timeIndices[n] for n in local])):
+      if (i % 100 == 0):
+        print("Analyzing temporal component {}/{}".format(i,self.size_time))
+
+      # -- Functionals shared by several reductions are only evaluated once.
+      # -- Constant functionals (e.g. G in the radial case) are broadcast.
+      values = {}
+      for name, (func, kind, *argument) in reductions.items():
+        if func not in values:
+          if outputs[func] is None:
+            value = func(*bundle)
+          else:
+            value = func(*bundle, out=self.WorkArray(outputs[func], bundle[0]))
+          values[func] = np.broadcast_to(value, bundle.shape[1:])
+        value = values[func]
+
+        if kind == "max":
+          maxIndices, maxValue = results[name]
+          maxIndices[n] = np.unravel_index(np.argmax(value), value.shape)
+          maxValue[n]   = value[tuple(maxIndices[n])]
+        elif kind == "integral":
+          results[name][n] = np.einsum('ijk,ijk->', value, weights, dtype=np.float64)
+        elif kind == "volume":
+          results[name][n] = np.sum(volumes, where=value >= argument[0], dtype=np.float64)
+        elif kind == "plane":
+          results[name][...,n] = value[...,argument[0]]
+        else:
+          results[name][n] = value[tuple(argument[0])]
+
+    for result in results.values():
+      self.ReduceSum(*(result if isinstance(result, tuple) else (result,)))
+
+    return results
+
+  @CachedResult
+  def FindTemporalFocalPlane(self, maxFunc=None, storeFunc=None, onePass=False, maxCandidates=4):
     """
     We determine the position of the focal plane by the plane containing the point
     at maxFunc is highest. We then return two arrays
     containing the temporal evolution of the focal point and the temporal evolution
     of the focal plane for the functional storeFunc.
+
+    With onePass, the maxima and the focal plane are determined in a single sweep
+    over time: storeFunc is recorded in the planes that contain the running
+    maximum (see FocalPlaneCandidates), and only the missing timesteps of the
+    final focal plane are read again, one plane at a time.
     """
     if (maxFunc==None):
       maxFunc = self.ElectricEnergyDensity
     if (storeFunc==None):
       storeFunc = self.Ez
 
+    if (onePass):
+      def EvaluatePlane(timeIdx, z_idx, bundle):
+        if bundle is None:
+          plane = self.GetTemporalPlaneBundle(timeIdx, z_idx)
+        else:
+          plane = bundle[...,z_idx:z_idx+1]
+        return np.array(storeFunc(*plane)[...,0])
+
+      maxIndices = np.zeros((self.size_time), dtype=(int,3))
+      maxValue   = np.zeros((self.size_time))
+      candidates = FocalPlaneCandidates(EvaluatePlane, maxCandidates)
+
+      localIndices = self.DistributeIndices(self.size_time)
+      for i, bundle in self.IterateTemporalBundles(localIndices):
+        if (i % 100 == 0):
+          print("Analyzing temporal component {}/{}".format(i,self.size_time))
+
+        func_value    = maxFunc(*bundle)
+        maxIndices[i] = np.unravel_index(np.argmax(func_value),(self.size_r,self.size_theta,self.size_z))
+        maxValue[i]   = func_value[maxIndices[i][0],maxIndices[i][1],maxIndices[i][2]]
+        candidates.Update(i, bundle, maxIndices[i][2], maxValue[i])
+
+      self.ReduceSum(maxIndices, maxValue)
+      focalPointMaxIdxTime = np.argmax(maxValue)
+      print("Maximum of the functional {} is {}".format(maxFunc.__name__,maxValue[focalPointMaxIdxTime]))
+
+      focalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time), dtype=self.real_dtype)
+      if (len(localIndices) > 0):
+        focalPlaneTime[:,:,localIndices.start:localIndices.stop] = candidates.GetPlane(maxIndices[focalPointMaxIdxTime][2], localIndices)
+      self.ReduceSum(focalPlaneTime)
+      focalPointTime = np.array(focalPlaneTime[maxIndices[focalPointMaxIdxTime][0],maxIndices[focalPointMaxIdxTime][1],:])
+
+      return maxIndices, maxValue, focalPointMaxIdxTime, focalPointTime, focalPlaneTime
+
     # -- The determine the positions of the maxima as a function of time.
     maxIndices, maxValue = self.FindMaximumValues(maxFunc)
 
@@ -337,64 +1762,62 @@ class Analysis3D:
 
     # -- We build array containing the temporal evolution of the focal point
     # -- and plane.
-    focalPointTime = np.zeros((self.size_time))
-    focalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-    for i in range(self.size_time):
-      focalPointTime[i] = storeFunc(self.GetTemporalComponent("Er", i),
-                                    self.GetTemporalComponent("Eth", i),
-                                    self.GetTemporalComponent("Ez", i),
-                                    self.GetTemporalComponent("Br", i),
-                                    self.GetTemporalComponent("Bth", i),
-                                    self.GetTemporalComponent("Bz", i))\
-                                    [maxIndices[focalPointMaxIdxTime][0],\
-                                     maxIndices[focalPointMaxIdxTime][1],\
-                                     maxIndices[focalPointMaxIdxTime][2]]
-      focalPlaneTime[:,:,i] = storeFunc(self.GetTemporalComponent("Er", i),
-                                        self.GetTemporalComponent("Eth", i),
-                                        self.GetTemporalComponent("Ez", i),
-                                        self.GetTemporalComponent("Br", i),
-                                        self.GetTemporalComponent("Bth", i),
-                                        self.GetTemporalComponent("Bz", i))\
-                                        [:,:,maxIndices[focalPointMaxIdxTime][2]]
+    # -- Only the focal plane is read, by blocks of PLANE_SERIES_BLOCK steps.
+    focalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time), dtype=self.real_dtype)
+    localIndices   = self.DistributeIndices(self.size_time)
+    timeBlocks     = [range(start, min(start+self.PLANE_SERIES_BLOCK, localIndices.stop))
+                      for start in range(localIndices.start, localIndices.stop, self.PLANE_SERIES_BLOCK)]
+    readBlock      = lambda timeBlock, buffer: self.GetTemporalPlaneSeries(maxIndices[focalPointMaxIdxTime][2], timeBlock)
+    for timeBlock, series in self.Sweep(readBlock, timeBlocks, [None]*(self.prefetch_depth+1)):
+      focalPlaneTime[:,:,timeBlock.start:timeBlock.stop] = storeFunc(*series)
+    self.ReduceSum(focalPlaneTime)
+
+    focalPointTime = np.array(focalPlaneTime[maxIndices[focalPointMaxIdxTime][0],maxIndices[focalPointMaxIdxTime][1],:])
 
     return maxIndices, maxValue, focalPointMaxIdxTime, focalPointTime, focalPlaneTime
 
-  def ComputeFocalArea(self, planeInformation, threshold):
-    """
-    This computes the area of the beam in a given temporal plane.
-    First, a contour is drawn using the contour(X,Y,Z,V) function.
-    The V argument will determine the threshold for the focal area, but we will
-    typically use maxValue/e^2. Then, we can use the vertices contained in the
-    contour object and apply the Green's theorem to find the area. Specifically,
-    ..math::
-        \oint_C \left(L dx + Mdy\right) == \iint\left(\frac{\partial M}{\partial x}-\frac{\partial L}{\partial y}\right)dxdy
-
-        with :math:`L=-y` and :math`M=x`.
-    """
-
-    def AreaFromContour(vertices):
-      """
-      Computes an area from the vertices of a contour.
-      """
-      area = 0
-      x0, y0 = vertices[0]
-      for [x1,y1] in vs[1:]:
-        dx   = x1-x0
-        dy   = y1-y0
-        area += 0.5*(y0*dx-x0*dy)
-        x0 = x1
-        y0 = y1
-      return -area
-
-    # -- Finds the maximum value of the functional.
-    maxValue = np.amax(planeInformation)
-    level    = [threshold*maxValue]
-
-    # -- Draw the contour and calculate the area.
-    cs      = plt.contour(self.X_meshgrid, self.Y_meshgrid,np.transpose(planeInformation), levels=level)
-    contour = cs.collections[0]
-    vs      = contour.get_paths()[0].vertices
-    return AreaFromContour(vs)
+  def ComputeFocalArea(self, planeInformation, threshold, subcell=False):
+    """
+    This computes the area of the beam in a given temporal plane, i.e. the area
+    of the region where the functional is above threshold times its maximum. We
+    will typically use threshold = 1/e^2. See ComputeFocalAreaBatch.
+    """
+    return self.ComputeFocalAreaBatch(np.asarray(planeInformation)[...,np.newaxis], threshold, subcell=subcell)[0]
+
+  def ComputeFocalAreaBatch(self, planes, threshold, axis=-1, subcell=False):
+    """
+    This computes the focal area, as in ComputeFocalArea, for a stack of
+    (r, theta) planes. axis is the axis of planes along which they are stacked.
+
+    Instead of drawing a contour, we sum the areas of the polar cells in which
+    the functional is above threshold times the maximum of its plane. The cells
+    are centred on the grid points: their radial extent goes from midpoint to
+    midpoint (the cell at r=0 being a disc sector) and their angular extent
+    wraps around periodically. With subcell=True, the functional is instead
+    linearly interpolated along r between the grid points, and only the part
+    of each radial segment above the level is counted. Returns the areas in m^2.
+    """
+    planes = np.moveaxis(np.asarray(planes), axis, -1)
+    level  = np.amax(planes, axis=(0,1))*threshold
+    r      = self.coord_r[:]*self.UNIT_LENGTH
+    dtheta = self.theta_widths[np.newaxis,:,np.newaxis]
+
+    if not subcell:
+      # -- Area of the annular sector of unit angle around each radius.
+      rEdges = CellEdges(r)
+      ring   = 0.5*np.diff(np.square(rEdges))[:,np.newaxis,np.newaxis]
+      return np.sum((planes >= level)*ring*dtheta, axis=(0,1))
+
+    # -- Linear interpolation of the crossing radius on each radial segment.
+    v0, v1 = planes[:-1], planes[1:]
+    r0, r1 = r[:-1,np.newaxis,np.newaxis], r[1:,np.newaxis,np.newaxis]
+    a0, a1 = v0 >= level, v1 >= level
+    with np.errstate(divide='ignore', invalid='ignore'):
+      rho  = r0 + (level-v0)/(v1-v0)*(r1-r0)
+    inner  = np.where(a0, r0, rho)
+    outer  = np.where(a1, r1, rho)
+    ring   = np.where(a0 | a1, 0.5*(np.square(outer)-np.square(inner)), 0.0)
+    return np.sum(ring*dtheta, axis=(0,1))
 
   def ComputeBeamWaist(self, planeInformation, threshold):
     """
@@ -407,17 +1830,7 @@ class Analysis3D:
     different values of theta and output a vector. We also single out the values
     for theta=0 and theta=pi/2.
     """
-    # -- Find the maximum value of the functional.
-    maxValue = np.amax(planeInformation)
-    waist    = np.zeros((self.size_theta))
-
-    # -- We compute the beam waist at each value of theta.
-    for i in range(self.size_theta):
-      for j in range(self.size_r):
-        value = planeInformation[j,i]
-        if (value < maxValue*threshold):
-          waist[i] = self.coord_r[j]*self.UNIT_LENGTH
-          break;
+    waist = self.ComputeBeamWaistBatch(np.asarray(planeInformation)[...,np.newaxis], threshold)[:,0]
 
     # -- Find the values for theta=0 and theta=pi/2.
     idx, value = vphys.find_nearest(self.coord_theta, np.pi/2)
@@ -425,6 +1838,24 @@ class Analysis3D:
 
     return waist[0], waist[idx],np.mean(waist)
 
+  def ComputeBeamWaistBatch(self, planes, threshold, axis=-1):
+    """
+    This computes the beam waist, as in ComputeBeamWaist, for a stack of
+    (r, theta) planes, e.g. the focal plane as a function of time or of
+    frequency. axis is the axis of planes along which they are stacked. For
+    each plane and each theta, the waist is the first radius at which the
+    functional falls below threshold times the maximum of that plane (zero if it
+    never does). Returns the waists as a (theta, stack) array.
+    """
+    planes   = np.moveaxis(np.asarray(planes), axis, -1)
+    maxValue = np.amax(planes, axis=(0,1))
+
+    # -- We find the first crossing of the threshold along r.
+    below    = planes < maxValue*threshold
+    first    = np.argmax(below, axis=0)
+
+    return np.where(np.any(below, axis=0), self.coord_r[:][first]*self.UNIT_LENGTH, 0.0)
+
 
   def TemporalDuration(self, temporalFunctional):
     """
@@ -432,105 +1863,158 @@ class Analysis3D:
     done by computing the Hilbert transform of the given signal, and then
     measuring the FWHM duration.
     """
-    # -- We compute the Hilbert transform.
-    hilbertTransform = signal.hilbert(temporalFunctional)
+    return EnvelopeDurations(temporalFunctional, self.dt)
 
-    # -- We compute the squared envelope.
-    envelope         = np.abs(hilbertTransform)
-    envelopeSq       = np.power(envelope,2)
+  def TemporalDurationMap(self, temporalBlock, axis=-1):
+    """
+    Computes the FWHM durations of the envelope and of the squared envelope,
+    as in TemporalDuration, at every point of a block of temporal signals, e.g.
+    the (r, theta, t) focal plane returned by FindTemporalFocalPlane. axis is
+    the time axis of the block. Returns the two duration maps.
+    """
+    return EnvelopeDurations(temporalBlock, self.dt, axis=axis)
 
-    # -- We compute the FWHM of the beam.
-    maxEnvelope   = np.amax(envelope)
-    maxEnvelopeSq = np.amax(envelopeSq)
-    for i in range(envelope.size):
-      if (envelope[i]>maxEnvelope/2):
-        firstIndex = i
-        break
+  def ComputeLocalSpectrum(self, temporalBlock, axis=-1, dt=None, workers=None):
+    """
+    Computes the power spectrum of every signal of a block of temporal
+    signals, e.g. the (r, theta, t) focal plane returned by FindTemporalFocalPlane,
+    with a single batched real FFT along the time axis (scipy.fft keeps the
+    FFT plans from one call to the next). dt is the time step, that of the
+    temporal file by default, and workers is passed on to scipy.fft.
 
-    for i in reversed(range(envelope.size)):
-      if (envelope[i]>maxEnvelope/2):
-        lastIndex = i
-        break
+    When the frequency file is loaded, the spectra are linearly interpolated
+    on its frequencies (and vanish outside of the FFT band). The interpolation
+    is computed once per number of samples and time step. Returns the
+    frequencies (in Hz) and the spectra, indexed as [..., frequency].
+    """
+    import scipy.fft as fft
+
+    if dt is None:
+      dt = self.dt
+
+    series  = np.moveaxis(np.asarray(temporalBlock), axis, -1)
+    spectra = np.abs(fft.rfft(series, axis=-1, workers=workers))
+    spectra = np.square(spectra, out=spectra)
+    spectra *= dt**2
+    grid    = fft.rfftfreq(series.shape[-1], dt)
+    if not self.freq_file_loaded:
+      return grid, spectra
+
+    key = (series.shape[-1], dt)
+    if key not in self.spectrum_plans:
+      nu     = self.omega[:]
+      index  = np.clip(np.searchsorted(grid, nu)-1, 0, grid.size-2)
+      inside = (nu >= grid[0]) & (nu <= grid[-1])
+      weight = np.where(inside, (nu-grid[index])/(grid[index+1]-grid[index]), 0.0)
+      self.spectrum_plans[key] = (nu, index, weight, inside)
+
+    nu, index, weight, inside = self.spectrum_plans[key]
+    weight = weight.astype(spectra.dtype, copy=False)
+    return nu, (spectra[...,index]*(1-weight)+spectra[...,index+1]*weight)*inside
+
+  def ComputeSpectralMaps(self, temporalBlock, axis=-1, dt=None):
+    """
+    Computes the maps of the spectral centroid and of the RMS bandwidth (in Hz)
+    of a block of temporal signals, from the spectra of ComputeLocalSpectrum.
+    """
+    return SpectralMoments(*self.ComputeLocalSpectrum(temporalBlock, axis=axis, dt=dt))
 
-    envelopeIdx = self.dt*(lastIndex-firstIndex)
+  def GetEnergyWeights(self):
+    """
+    Returns the (r, theta, z) weights of the nested Simpson integrations over
+    the volume, including the Jacobian r. They are computed on the first call
+    only.
+    """
+    if self.energy_weights is None:
+      self.energy_weights = SimpsonWeights(self.coord_r[:])[:,np.newaxis,np.newaxis]*self.coord_r[:][:,np.newaxis,np.newaxis] \
+                           *SimpsonWeights(self.coord_theta[:])[np.newaxis,:,np.newaxis]                                    \
+                           *SimpsonWeights(self.coord_z[:])[np.newaxis,np.newaxis,:]
 
-    for i in range(envelope.size):
-      if (envelopeSq[i]>maxEnvelopeSq/2):
-        firstIndex = i
-        break;
+    return self.energy_weights
 
-    for i in reversed(range(envelope.size)):
-      if (envelopeSq[i]>maxEnvelopeSq/2):
-        lastIndex = i
-        break;
+  def GetCellVolumes(self):
+    """
+    Returns the (r, theta, z) volumes (in m^3) of the cylindrical cells centred
+    on the grid points, r*dr*dtheta*dz. As in ComputeFocalAreaBatch, the cells
+    extend from midpoint to midpoint (the cell at r=0 being a cylinder sector)
+    and wrap around in theta. They are computed on the first call only.
+    """
+    if self.cell_volumes is None:
+      ring   = 0.5*np.diff(np.square(CellEdges(self.coord_r[:]*self.UNIT_LENGTH)))
+      dtheta = self.theta_widths
+      dz     = np.diff(CellEdges(self.coord_z[:]*self.UNIT_LENGTH))
+      self.cell_volumes = ring[:,np.newaxis,np.newaxis]*dtheta[np.newaxis,:,np.newaxis]*dz[np.newaxis,np.newaxis,:]
 
-    envelopeSqIdx = self.dt*(lastIndex-firstIndex)
-    return envelopeIdx, envelopeSqIdx
+    return self.cell_volumes
 
   def ComputeTotalEnergyDensityTemporal(self, timeIdx):
     """
     We compute the total electromagnetic energy contained in the
     volume in which we have computed the field.
     """
-    integrand = np .zeros((self.size_r, self.size_theta,self.size_z))
+    bundle = self.GetTemporalBundle(timeIdx)
+    return 0.5*np.einsum('cijk,cijk,ijk->', bundle, bundle, self.GetEnergyWeights(), dtype=np.float64)*self.UNIT_MASS*self.SPEED_OF_LIGHT**2
 
-    Er           = self.GetTemporalComponent("Er", timeIdx)
-    Eth          = self.GetTemporalComponent("Eth", timeIdx)
-    Ez           = self.GetTemporalComponent("Ez", timeIdx)
-    Br           = self.GetTemporalComponent("Br", timeIdx)
-    Bth          = self.GetTemporalComponent("Bth", timeIdx)
-    Bz           = self.GetTemporalComponent("Bz", timeIdx)
+  @CachedResult
+  def ComputeTotalEnergyCurve(self, timeIndices=None):
+    """
+    We compute the total electromagnetic energy contained in the volume for
+    each of the given timesteps (all of them if none are given), in a single
+    pass over the temporal file. Each timestep is reduced with one contraction
+    against the precomputed quadrature weights.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
 
-    integrand = 0.5*(Er[:]**2+Eth[:]**2+Ez[:]**2+Br[:]**2+Bth[:]**2+Bz[:]**2)
+    weights = self.GetEnergyWeights()
+    energy  = np.zeros((len(timeIndices)))
+    local   = self.DistributeIndices(len(timeIndices))
 
-    for i in range(integrand.shape[0]):
-      integrand[i,:,:] *= self.coord_r[i]
+    for n, (i, bundle) in zip(local, self.IterateTemporalBundles([timeIndices[n] for n in local])):
+      energy[n] = 0.5*np.einsum('cijk,cijk,ijk->', bundle, bundle, weights, dtype=np.float64)
 
-    return integration.simps(integration.simps(integration.simps(integrand, x=self.coord_z[:]), x=self.coord_theta[:]), x=self.coord_r[:])*self.UNIT_MASS*self.SPEED_OF_LIGHT**2
+    self.ReduceSum(energy)
 
+    return energy*self.UNIT_MASS*self.SPEED_OF_LIGHT**2
+
+  def WorkArray(self,name,like):
+    """
+    Returns the work array name of our workspace, shaped like the array like.
+    """
+    return self.workspace.Get(name, np.shape(like), np.result_type(like))
 
-  def LorentzInvariantF(self,Er,Eth,Ez,Br,Bth,Bz):
+  def LorentzInvariantF(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Computes the Lorentz invariant 0.5*(|E|^2-|B|^2).
     """
-    magneticMagnitude = np.power(Br,2)+np.power(Bth,2)+np.power(Bz,2)
-    electricMagnitude = np.power(Er,2)+np.power(Eth,2)+np.power(Ez,2)
+    work              = self.WorkArray("square", Er)
+    magneticMagnitude = SumOfProducts((Br,Bth,Bz), (Br,Bth,Bz), out=self.WorkArray("magnetic", Er), work=work)
+    electricMagnitude = SumOfProducts((Er,Eth,Ez), (Er,Eth,Ez), out=out, work=work)
 
-    return 0.5*(electricMagnitude-magneticMagnitude)
+    electricMagnitude -= magneticMagnitude
+    electricMagnitude *= 0.5
+    return electricMagnitude
 
   def LorentzInvariantF_time(self,timeIdx):
-    Er           = self.GetTemporalComponent("Er", timeIdx)[:]
-    Eth          = self.GetTemporalComponent("Eth", timeIdx)[:]
-    Ez           = self.GetTemporalComponent("Ez", timeIdx)[:]
-    Br           = self.GetTemporalComponent("Br", timeIdx)[:]
-    Bth          = self.GetTemporalComponent("Bth", timeIdx)[:]
-    Bz           = self.GetTemporalComponent("Bz", timeIdx)[:]
-
-    return self.LorentzInvariantF(Er,Eth,Ez,Br,Bth,Bz)
+    return self.LorentzInvariantF(*self.GetTemporalBundle(timeIdx))
 
 
-  def LorentzInvariantG(self,Er,Eth,Ez,Br,Bth,Bz):
+  def LorentzInvariantG(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Computes the Lorentz invariant (E \cdot B)/c.
     """
-    return (Er[:]*Br[:]+Eth[:]*Bth[:]+Ez[:]*Bz[:])
+    return SumOfProducts((Er,Eth,Ez), (Br,Bth,Bz), out=out, work=self.WorkArray("square", Er))
 
   def LorentzInvariantG_time(self,timeIdx):
-    Er           = self.GetTemporalComponent("Er", timeIdx)[:]
-    Eth          = self.GetTemporalComponent("Eth", timeIdx)[:]
-    Ez           = self.GetTemporalComponent("Ez", timeIdx)[:]
-    Br           = self.GetTemporalComponent("Br", timeIdx)[:]
-    Bth          = self.GetTemporalComponent("Bth", timeIdx)[:]
-    Bz           = self.GetTemporalComponent("Bz", timeIdx)[:]
-
-    return self.LorentzInvariantG(Er,Eth,Ez,Br,Bth,Bz)
+    return self.LorentzInvariantG(*self.GetTemporalBundle(timeIdx))
 
   def LorentzInvariantE_time(self,timeIdx):
     """
     Computes the Lorentz invariant sqrt(sqrt(F^2+G^2)+F).
     """
-    F = self.LorentzInvariantF_time(timeIdx)
-    G = self.LorentzInvariantG_time(timeIdx)
+    bundle = self.GetTemporalBundle(timeIdx)
+    F      = self.LorentzInvariantF(*bundle)
+    G      = self.LorentzInvariantG(*bundle)
 
     return np.sqrt(np.sqrt(F**2+G**2)+F)
 
@@ -538,339 +2022,348 @@ class Analysis3D:
     """
     Computes the Lorentz invariant sqrt(sqrt(F^2+G^2)-F).
     """
-    F = self.LorentzInvariantF_time(timeIdx)
-    G = self.LorentzInvariantG_time(timeIdx)
+    bundle = self.GetTemporalBundle(timeIdx)
+    F      = self.LorentzInvariantF(*bundle)
+    G      = self.LorentzInvariantG(*bundle)
 
     return np.sqrt(np.sqrt(F**2+G**2)-F)
 
-  def ElectricEnergyDensity(self,Er,Eth,Ez,Br,Bth,Bz):
+  def ElectricEnergyDensity(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Computes the electric energy intensity in the temporal domain (in W/cm^2).
     """
-    electric_intensity = 0.5*self.SPEED_OF_LIGHT                           \
-                            *self.EPSILON_0                                \
-                            *np.power(self.UNIT_E_FIELD,2)                 \
-                            *(np.power(Er,2)+np.power(Eth,2)+np.power(Ez,2))
-    return electric_intensity/1e4
+    electric_intensity  = SumOfProducts((Er,Eth,Ez), (Er,Eth,Ez), out=out, work=self.WorkArray("square", Er))
+    electric_intensity *= 0.5*self.SPEED_OF_LIGHT                          \
+                             *self.EPSILON_0                               \
+                             *np.power(self.UNIT_E_FIELD,2)
+    electric_intensity /= 1e4
+    return electric_intensity
 
-  def MagneticEnergyDensity(self,Er,Eth,Ez,Br,Bth,Bz):
+  def MagneticEnergyDensity(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Computes the magnetic energy intensity in the temporal domain (in W/cm^2).
     """
-    magnetic_intensity = 0.5*self.SPEED_OF_LIGHT                           \
-                            /self.MU_0                                     \
-                            *np.power(self.UNIT_B_FIELD,2)                 \
-                            *(np.power(Br,2)+np.power(Bth,2)+np.power(Bz,2))
-    return magnetic_intensity/1e4
+    magnetic_intensity  = SumOfProducts((Br,Bth,Bz), (Br,Bth,Bz), out=out, work=self.WorkArray("square", Br))
+    magnetic_intensity *= 0.5*self.SPEED_OF_LIGHT                          \
+                             /self.MU_0                                    \
+                             *np.power(self.UNIT_B_FIELD,2)
+    magnetic_intensity /= 1e4
+    return magnetic_intensity
 
-  def ElectromagneticEnergyDensity(self,Er,Eth,Ez,Br,Bth,Bz):
+  def ElectromagneticEnergyDensity(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Computes the total electromagnetic energy density in the temporal domain.
     """
-    em_intensity = self.ElectricEnergyDensity(Er,Eth,Ez,Br,Bth,Bz)+self.MagneticEnergyDensity(Er,Eth,Ez,Br,Bth,Bz)
+    em_intensity  = self.ElectricEnergyDensity(Er,Eth,Ez,Br,Bth,Bz,out=out)
+    em_intensity += self.MagneticEnergyDensity(Er,Eth,Ez,Br,Bth,Bz,out=self.WorkArray("magnetic", Br))
     return em_intensity
 
-  def Er(self,Er,Eth,Ez,Br,Bth,Bz):
+  def Er(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Returns the Er component of the electric field (in V/m).
     """
-    return self.UNIT_E_FIELD*Er[:]
+    return np.multiply(self.UNIT_E_FIELD, Er, out=out)
 
-  def Eth(self,Er,Eth,Ez,Br,Bth,Bz):
+  def Eth(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Return the Eth component of the electric field (in V/m).
     """
-    return self.UNIT_E_FIELD*Eth[:]
+    return np.multiply(self.UNIT_E_FIELD, Eth, out=out)
 
-  def Ez(self,Er,Eth,Ez,Br,Bth,Bz):
+  def Ez(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Return the Ez component of the electric field (in V/m).
     """
-    return self.UNIT_E_FIELD*Ez[:]
+    return np.multiply(self.UNIT_E_FIELD, Ez, out=out)
 
-  def Br(self,Er,Eth,Ez,Br,Bth,Bz):
+  def Br(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Return the Br component of the electric field (in T).
     """
-    return self.UNIT_B_FIELD*Br[:]
+    return np.multiply(self.UNIT_B_FIELD, Br, out=out)
 
-  def Bth(self,Er,Eth,Ez,Br,Bth,Bz):
+  def Bth(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Return the Bth component of the electric field (in T).
     """
-    return self.UNIT_B_FIELD*Bth[:]
+    return np.multiply(self.UNIT_B_FIELD, Bth, out=out)
 
-  def Bz(self,Er,Eth,Ez,Br,Bth,Bz):
+  def Bz(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Return the Bz component of the electric field (in T).
     """
-    return self.UNIT_B_FIELD*Bz[:]
+    return np.multiply(self.UNIT_B_FIELD, Bz, out=out)
 
-  def ExAbsCart(self,Er,Eth,Ez,Br,Bth,Bz):
+  def TrigonometricTables(self,ndim):
     """
-    Returns the component Ex.
+    Returns the cos(theta) and sin(theta) tables, shaped so that they broadcast
+    against an array of dimension ndim whose second axis is theta, e.g.
+    (r, theta), (r, theta, z) or (r, theta, z, t).
     """
-    Ex = np.zeros_like(Er)
-    for i in range(self.size_theta):
-      c = np.cos(self.coord_theta[i])
-      s = np.sin(self.coord_theta[i])
-      Ex[:,i,:] = c*Er[:,i,:]-s*Eth[:,i,:]
+    shape = (1,-1)+(1,)*(ndim-2)
+    return self.cos_theta.reshape(shape), self.sin_theta.reshape(shape)
 
-    return np.abs(Ex)
+  @contextlib.contextmanager
+  def SampledTheta(self,thetaIndices):
+    """
+    Restricts the trigonometric tables to the given theta indices, so that the
+    functionals can be evaluated on blocks that only hold these angles, e.g.
+    subsampled ones.
+    """
+    tables = self.cos_theta, self.sin_theta
+    self.cos_theta, self.sin_theta = tables[0][thetaIndices], tables[1][thetaIndices]
+    try:
+      yield
+    finally:
+      self.cos_theta, self.sin_theta = tables
 
-  def EyAbsCart(self,Er,Eth,Ez,Br,Bth,Bz):
+  def CartesianX(self,Ar,Ath,out=None):
     """
-    Returns the Ey component.
+    Returns the x component cos(theta)*Ar-sin(theta)*Ath of a vector field
+    given by its cylindrical components. out may be Ar, but not Ath.
     """
-    Ey = np.zeros_like(Er)
-    for i in range(self.size_theta):
-      c = np.cos(self.coord_theta[i])
-      s = np.sin(self.coord_theta[i])
-      Ey[:,i,:] = s*Er[:,i,:]+c*Eth[:,i,:]
+    c, s = self.TrigonometricTables(np.ndim(Ar))
+    out  = np.multiply(Ar, c, out=out)
+    out -= np.multiply(Ath, s, out=self.WorkArray("rotation", out))
+    return out
 
-    return np.abs(Ey)
+  def CartesianY(self,Ar,Ath,out=None):
+    """
+    Returns the y component sin(theta)*Ar+cos(theta)*Ath of a vector field
+    given by its cylindrical components. out may be Ath, but not Ar.
+    """
+    c, s = self.TrigonometricTables(np.ndim(Ar))
+    out  = np.multiply(Ath, c, out=out)
+    out += np.multiply(Ar, s, out=self.WorkArray("rotation", out))
+    return out
+
+  def RotateToCartesian(self,Ar,Ath,outX=None,outY=None):
+    """
+    Rotates the cylindrical components (Ar, Ath) of a vector field, given on
+    whole (r, theta[, z][, t]) blocks, to their Cartesian components (Ax, Ay).
+    The results are written in outX and outY when they are given. The
+    rotation can be done in place, i.e. with outX=Ar and outY=Ath.
 
-  def EzAbsCart(self,Er,Eth,Ez,Br,Bth,Bz):
-    return np.abs(Ez)
+    The blocks are rotated one radius at a time, so that the work arrays kept
+    in the workspace are the size of a single (theta[, z][, t]) slice rather
+    than of the whole block.
+    """
+    if outX is None:
+      outX = np.empty(np.shape(Ar), dtype=np.result_type(Ar, self.cos_theta))
+    if outY is None:
+      outY = np.empty(np.shape(Ath), dtype=np.result_type(Ath, self.cos_theta))
+
+    for k in range(np.shape(Ar)[0]):
+      rows = slice(k, k+1)
 
-  def BxAbsCart(self,Er,Eth,Ez,Br,Bth,Bz):
-    Bx = np.zeros_like(Er)
-    for i in range(self.size_theta):
-      c = np.cos(self.coord_theta[i])
-      s = np.sin(self.coord_theta[i])
-      Bx[:,i,:] = c*Br[:,i,:]-s*Bth[:,i,:]
+      # -- Ay is kept in the workspace until Ath has been used for Ax.
+      Ay = self.CartesianY(Ar[rows], Ath[rows], out=self.WorkArray("rotated", Ath[rows]))
+      self.CartesianX(Ar[rows], Ath[rows], out=outX[rows])
+      outY[rows] = Ay
 
-    return np.abs(Bx)
+    return outX, outY
+
+  def ExAbsCart(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
+    """
+    Returns the component Ex.
+    """
+    Ex = self.CartesianX(Er, Eth, out=out)
+    return np.abs(Ex, out=Ex)
 
-  def ByAbsCart(self,Er,Eth,Ez,Br,Bth,Bz):
+  def EyAbsCart(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
     """
     Returns the Ey component.
     """
-    By = np.zeros_like(Er)
-    for i in range(self.size_theta):
-      c = np.cos(self.coord_theta[i])
-      s = np.sin(self.coord_theta[i])
-      By[:,i,:] = s*Br[:,i,:]+c*Bth[:,i,:]
+    Ey = self.CartesianY(Er, Eth, out=out)
+    return np.abs(Ey, out=Ey)
+
+  def EzAbsCart(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
+    return np.abs(Ez, out=out)
+
+  def BxAbsCart(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
+    Bx = self.CartesianX(Br, Bth, out=out)
+    return np.abs(Bx, out=Bx)
 
-    return np.abs(By)
+  def ByAbsCart(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
+    """
+    Returns the Ey component.
+    """
+    By = self.CartesianY(Br, Bth, out=out)
+    return np.abs(By, out=By)
 
-  def BzAbsCart(self,Er,Eth,Ez,Br,Bth,Bz):
-    return np.abs(Bz)
+  def BzAbsCart(self,Er,Eth,Ez,Br,Bth,Bz,out=None):
+    return np.abs(Bz, out=out)
 
-  def PairDensity(self,Er,Eth,Ez,Br,Bth,Bz):
+  def PairDensity(self,Er,Eth,Ez,Br,Bth,Bz,chunkSize=None,out=None):
     """
     Computes the pair density.
+
+    The volume is processed by chunks of chunkSize voxels (PAIR_DENSITY_CHUNK by
+    default) to bound the size of the temporaries. The voxels in which
+    exp(-pi/E) underflows, which include the E=0 limit, are skipped since their
+    density vanishes. In the H=0 limit, H*E/tanh(pi*H/E) is replaced by E^2/pi.
     """
-    F = self.LorentzInvariantF(Er,Eth,Ez,Br,Bth,Bz)
-    G = self.LorentzInvariantG(Er,Eth,Ez,Br,Bth,Bz)
-
-    E = np.sqrt(np.sqrt(F**2+G**2)+F)
-    H = np.sqrt(np.sqrt(F**2+G**2)-F)
-
-    prefac = np.zeros_like(F)
-    exp    = np.zeros_like(F)
-    for i in range(E.size):
-      if math.isclose(E.flat[i], 0.0):
-        prefac.flat[i] = 0.0
-        exp.flat[i]         = 0.0
-      elif math.isclose(H.flat[i], 0.0):
-        prefac.flat[i] = E.flat[i]*E.flat[i]/np.pi
-        exp.flat[i]    = np.exp(-np.pi/E.flat[i])
-      else:
-        prefac.flat[i] = H.flat[i]*E.flat[i]/np.tanh(np.pi*H.flat[i]/E.flat[i])
-        exp.flat[i]    = np.exp(-np.pi/E.flat[i])
+    import scipy.constants as cst
+
+    if chunkSize is None:
+      chunkSize = self.PAIR_DENSITY_CHUNK
+
+    fields  = [np.asarray(comp).reshape(-1) for comp in (Er,Eth,Ez,Br,Bth,Bz)]
+    if out is None:
+      out   = np.empty(np.shape(Er), dtype=np.result_type(Er))
+    density = out.reshape(-1)
+    density[:] = 0.0
+
+    # -- Below this value of E, exp(-pi/E) underflows.
+    E_min   = -np.pi/np.log(np.finfo(density.dtype).tiny)
+
+    for start in range(0, density.size, chunkSize):
+      chunk = slice(start, start+chunkSize)
+      F     = self.LorentzInvariantF(*[field[chunk] for field in fields], out=self.WorkArray("F", fields[0][chunk]))
+      G     = self.LorentzInvariantG(*[field[chunk] for field in fields], out=self.WorkArray("G", fields[0][chunk]))
+
+      norm  = np.hypot(F,G)
+      E     = np.sqrt(norm+F)
+      live  = E > E_min
+      if not live.any():
+        continue
+
+      E      = E[live]
+      H      = np.sqrt(np.maximum(norm[live]-F[live],0.0))
+      ratio  = np.pi*H/E
+      prefac = E*E/np.pi
+      small  = ratio < 1e-8
+      prefac[~small] = H[~small]*E[~small]/np.tanh(ratio[~small])
+
+      density[chunk][live] = prefac*np.exp(-np.pi/E)
 
-    return cst.alpha/cst.pi*prefac*exp
+    out *= cst.alpha/cst.pi
+    return out
 
   def PairDensityTime(self, timeIdx):
     """
     Computes the pair density as at a given time index.
     """
+    return self.PairDensity(*self.GetTemporalBundle(timeIdx))
 
-    Er           = self.GetTemporalComponent("Er", timeIdx)[:]
-    Eth          = self.GetTemporalComponent("Eth", timeIdx)[:]
-    Ez           = self.GetTemporalComponent("Ez", timeIdx)[:]
-    Br           = self.GetTemporalComponent("Br", timeIdx)[:]
-    Bth          = self.GetTemporalComponent("Bth", timeIdx)[:]
-    Bz           = self.GetTemporalComponent("Bz", timeIdx)[:]
-
-    return self.PairDensity(Er,Eth,Ez,Br,Bth,Bz)
-
+  @CachedResult
   def GetFocalPlaneInTimeCartesian(self,z_idx):
     """
     Returns the Cartesian components of the electromagnetic field in a given
     z plane, usually the focal lane, as a function of time.
     """
-    ExFocalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-    EyFocalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-    EzFocalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-    BxFocalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-    ByFocalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-    BzFocalPlaneTime = np.zeros((self.size_r,self.size_theta,self.size_time))
-
-    for i in range(self.size_time):
-      # -- We get the cylindrical components first.
-      Er  = self.GetTemporalComponent("Er",  i)[:,:,z_idx]
-      Eth = self.GetTemporalComponent("Eth", i)[:,:,z_idx]
-      Ez  = self.GetTemporalComponent("Ez", i)[:,:,z_idx]
-      Br  = self.GetTemporalComponent("Br",  i)[:,:,z_idx]
-      Bth = self.GetTemporalComponent("Bth", i)[:,:,z_idx]
-      Bz  = self.GetTemporalComponent("Bz", i)[:,:,z_idx]
-
-      for j in range(Er.shape[1]):
-        c = np.cos(self.coord_theta[j])
-        s = np.sin(self.coord_theta[j])
-
-        for k in range(Er.shape[0]):
-          ExFocalPlaneTime[k,j,i] = c*Er[k,j]-s*Eth[k,j]
-          EyFocalPlaneTime[k,j,i] = s*Er[k,j]+c*Eth[k,j]
-          BxFocalPlaneTime[k,j,i] = c*Br[k,j]-s*Bth[k,j]
-          ByFocalPlaneTime[k,j,i] = s*Br[k,j]+c*Bth[k,j]
-
-      EzFocalPlaneTime[:,:,i] = Ez[:,:]
-      BzFocalPlaneTime[:,:,i] = Bz[:,:]
+    # -- We read the cylindrical components of the timesteps of this rank
+    # -- straight into the output block, and rotate the whole (r, theta, t)
+    # -- blocks in place.
+    localIndices = self.DistributeIndices(self.size_time)
+    block        = np.zeros((len(self.COMPONENTS),self.size_r,self.size_theta,self.size_time), dtype=self.real_dtype)
+    self.GetTemporalPlaneSeries(z_idx, localIndices, out=block[...,localIndices.start:localIndices.stop])
+    self.RotateToCartesian(block[0], block[1], block[0], block[1])
+    self.RotateToCartesian(block[3], block[4], block[3], block[4])
+    self.ReduceSum(block)
+
+    ExFocalPlaneTime, EyFocalPlaneTime, EzFocalPlaneTime, BxFocalPlaneTime, ByFocalPlaneTime, BzFocalPlaneTime = block
 
     return ExFocalPlaneTime, EyFocalPlaneTime, EzFocalPlaneTime, BxFocalPlaneTime, ByFocalPlaneTime, BzFocalPlaneTime
 
-  def GetSagittalPlaneInTimeCartesian(self):
+  def GetAxialCutSeries(self,cut,thetaIndices,readColumns,stepIndices,size,dtype):
     """
-    Return the Cartesian components of the electromagnetic field in a given
-    x-axis plane, known as the sagittal plane, as a function of time.
+    Assembles a cut of the field through the axis of the mesh, as a function of
+    time or frequency. The cut joins the half-plane thetaIndices[0], mirrored
+    in r, and the half-plane thetaIndices[1], without repeating r=0. For each
+    output component, cut gives the cylindrical component it is made of and
+    its signs on both half-planes (see SAGITTAL_CUT).
+
+    readColumns(comp, i, columns, out) must read the theta columns of comp at
+    step i into out, shaped as (r, 2, z), with a single selection. Only the
+    steps in stepIndices are filled, in arrays of size steps.
     """
-    # Test to figure out the proper size of the array.
-    ExSagittalPlane = np.concatenate([-self.GetTemporalComponent("Er",  0)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Er",  0)[1:,0,:]])
+    if not np.isclose(np.sum(self.theta_widths), 2*np.pi):
+      raise ValueError("The axial cuts need the whole theta grid, not a subset of it.")
 
-    # Set the proper array sizes.
-    ExSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_time))
-    EySagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_time))
-    EzSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_time))
-    BxSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_time))
-    BySagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_time))
-    BzSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_time))
+    columns  = sorted(thetaIndices)
+    neg, pos = columns.index(thetaIndices[0]), columns.index(thetaIndices[1])
 
-    for i in range(self.size_time):
-      ExSagittalPlane[:,:,i] = np.concatenate([-self.GetTemporalComponent("Er",  i)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Er",  i)[1:,0,:]])
-      EySagittalPlane[:,:,i] = np.concatenate([-self.GetTemporalComponent("Eth", i)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Eth", i)[1:,0,:]])
-      EzSagittalPlane[:,:,i] = np.concatenate([ self.GetTemporalComponent("Ez",  i)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Ez",  i)[1:,0,:]])
-      BxSagittalPlane[:,:,i] = np.concatenate([-self.GetTemporalComponent("Br",  i)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Br",  i)[1:,0,:]])
-      BySagittalPlane[:,:,i] = np.concatenate([-self.GetTemporalComponent("Bth", i)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Bth", i)[1:,0,:]])
-      BzSagittalPlane[:,:,i] = np.concatenate([ self.GetTemporalComponent("Bz",   i)[:,self.size_theta//2,:][::-1,:], self.GetTemporalComponent("Bz",  i)[1:,0,:]])
+    def ReadCut(i, buffer):
+      for c, (comp, negSign, posSign) in enumerate(cut):
+        readColumns(comp, i, columns, buffer[c])
+      return buffer
 
-    return ExSagittalPlane, EySagittalPlane, EzSagittalPlane, BxSagittalPlane,  BySagittalPlane, BzSagittalPlane
+    planes   = [np.zeros((2*self.size_r-1,self.size_z,size), dtype=dtype) for entry in cut]
+    buffers  = [np.empty((len(cut),self.size_r,2,self.size_z), dtype=dtype) for n in range(self.prefetch_depth+1)]
+    for i, buffer in self.Sweep(ReadCut, stepIndices, buffers):
+      for plane, column, (comp, negSign, posSign) in zip(planes, buffer, cut):
+        np.multiply(column[::-1,neg,:], negSign, out=plane[:self.size_r,:,i])
+        np.multiply(column[1:,pos,:],   posSign, out=plane[self.size_r:,:,i])
 
-  def GetMeridionalPlaneInTimeCartesian(self):
+    return planes
+
+  def ReadTemporalColumns(self,comp,timeIdx,columns,out):
     """
-    Returns the Cartesian components of the electromagnetic field in a given
-    y plane, known as the meriodional plane, as a function of time.
+    Reads the theta columns of the time-th temporal component comp into out.
     """
-    # Test to figure out the array size.
-    ExMeridionalPlane = np.concatenate([ self.GetTemporalComponent("Eth", 0)[:,3*self.size_theta//4,:][::-1,:], -self.GetTemporalComponent("Eth", 0)[1:,self.size_theta//4,:]])
+    self.ReadTemporalComponent(comp, timeIdx, out, np.s_[:,columns,:])
 
-    # Set the proper array sizes.
-    ExMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_time))
-    EyMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_time))
-    EzMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_time))
-    BxMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_time))
-    ByMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_time))
-    BzMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_time))
+  def ReadFrequencyColumns(self,comp,freq,columns,out):
+    """
+    Reads the theta columns of the freq-th frequency component comp into out,
+    with GetFrequencySelection.
+    """
+    out[...] = self.GetFrequencySelection(comp, freq, np.s_[:,columns,:])
 
-    for i in range(self.size_time):
-      ExMeridionalPlane[:,:,i] = np.concatenate([ self.GetTemporalComponent("Eth", i)[:,3*self.size_theta//4,:][::-1,:], -self.GetTemporalComponent("Eth", i)[1:,self.size_theta//4,:]])
-      EyMeridionalPlane[:,:,i] = np.concatenate([-self.GetTemporalComponent("Er",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetTemporalComponent("Er",  i)[1:,self.size_theta//4,:]])
-      EzMeridionalPlane[:,:,i] = np.concatenate([ self.GetTemporalComponent("Ez",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetTemporalComponent("Ez",  i)[1:,self.size_theta//4,:]])
-      BxMeridionalPlane[:,:,i] = np.concatenate([ self.GetTemporalComponent("Bth", i)[:,3*self.size_theta//4,:][::-1,:], -self.GetTemporalComponent("Bth", i)[1:,self.size_theta//4,:]])
-      ByMeridionalPlane[:,:,i] = np.concatenate([-self.GetTemporalComponent("Br",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetTemporalComponent("Br",  i)[1:,self.size_theta//4,:]])
-      BzMeridionalPlane[:,:,i] = np.concatenate([ self.GetTemporalComponent("Bz",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetTemporalComponent("Bz",  i)[1:,self.size_theta//4,:]])
+  @CachedResult
+  def GetSagittalPlaneInTimeCartesian(self):
+    """
+    Return the Cartesian components of the electromagnetic field in a given
+    x-axis plane, known as the sagittal plane, as a function of time.
+    """
+    planes = self.GetAxialCutSeries(self.SAGITTAL_CUT, (self.size_theta//2, 0), self.ReadTemporalColumns,
+                                    self.DistributeIndices(self.size_time), self.size_time, self.real_dtype)
+    return self.ReduceSum(*planes)
 
-    return ExMeridionalPlane, EyMeridionalPlane, EzMeridionalPlane, BxMeridionalPlane, ByMeridionalPlane, BzMeridionalPlane
+  @CachedResult
+  def GetMeridionalPlaneInTimeCartesian(self):
+    """
+    Returns the Cartesian components of the electromagnetic field in a given
+    y plane, known as the meriodional plane, as a function of time.
+    """
+    planes = self.GetAxialCutSeries(self.MERIDIONAL_CUT, (3*self.size_theta//4, self.size_theta//4), self.ReadTemporalColumns,
+                                    self.DistributeIndices(self.size_time), self.size_time, self.real_dtype)
+    return self.ReduceSum(*planes)
 
+  @CachedResult
   def GetFocalPlaneInFreqCartesian(self,z_idx):
     """
     Returns the Cartesian components of the electromagnetic field in a given
     z plane, usually the focal lane, as a function of frequency.
     """
-    ExFocalPlaneFreq = np.zeros((self.size_r,self.size_theta,self.size_freq), dtype=complex)
-    EyFocalPlaneFreq = np.zeros((self.size_r,self.size_theta,self.size_freq), dtype=complex)
-    EzFocalPlaneFreq = np.zeros((self.size_r,self.size_theta,self.size_freq), dtype=complex)
-    BxFocalPlaneFreq = np.zeros((self.size_r,self.size_theta,self.size_freq), dtype=complex)
-    ByFocalPlaneFreq = np.zeros((self.size_r,self.size_theta,self.size_freq), dtype=complex)
-    BzFocalPlaneFreq = np.zeros((self.size_r,self.size_theta,self.size_freq), dtype=complex)
+    # -- We read the cylindrical components, and rotate the whole
+    # -- (r, theta, omega) blocks in place.
+    block = self.GetFrequencyPlaneSeries(z_idx)
+    self.RotateToCartesian(block[0], block[1], block[0], block[1])
+    self.RotateToCartesian(block[3], block[4], block[3], block[4])
 
-    for i in range(self.size_freq):
-      # -- We get the cylindrical components first.
-      Er  = self.GetFrequencyComponent("Er",  i)[:,:,z_idx]
-      Eth = self.GetFrequencyComponent("Eth", i)[:,:,z_idx]
-      Ez  = self.GetFrequencyComponent("Ez", i)[:,:,z_idx]
-      Br  = self.GetFrequencyComponent("Br",  i)[:,:,z_idx]
-      Bth = self.GetFrequencyComponent("Bth", i)[:,:,z_idx]
-      Bz  = self.GetFrequencyComponent("Bz", i)[:,:,z_idx]
-
-      for j in range(Er.shape[1]):
-        c = np.cos(self.coord_theta[j])
-        s = np.sin(self.coord_theta[j])
-
-        for k in range(Er.shape[0]):
-          ExFocalPlaneFreq[k,j,i] = c*Er[k,j]-s*Eth[k,j]
-          EyFocalPlaneFreq[k,j,i] = s*Er[k,j]+c*Eth[k,j]
-          BxFocalPlaneFreq[k,j,i] = c*Br[k,j]-s*Bth[k,j]
-          ByFocalPlaneFreq[k,j,i] = s*Br[k,j]+c*Bth[k,j]
-
-      EzFocalPlaneFreq[:,:,i] = Ez[:,:]
-      BzFocalPlaneFreq[:,:,i] = Bz[:,:]
+    ExFocalPlaneFreq, EyFocalPlaneFreq, EzFocalPlaneFreq, BxFocalPlaneFreq, ByFocalPlaneFreq, BzFocalPlaneFreq = block
 
     return ExFocalPlaneFreq, EyFocalPlaneFreq, EzFocalPlaneFreq, BxFocalPlaneFreq, ByFocalPlaneFreq, BzFocalPlaneFreq
 
+  @CachedResult
   def GetSagittalPlaneInFreqCartesian(self):
     """
     Return the Cartesian components of the electromagnetic field in a given
     x-axis plane, known as the sagittal plane, as a function of frequency.
     """
-    # Test to figure out the proper size of the array.
-    ExSagittalPlane = np.concatenate([-self.GetFrequencyComponent("Er",  0)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Er",  0)[1:,0,:]])
-
-    # Set the proper array sizes.
-    ExSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_freq), dtype=complex)
-    EySagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_freq), dtype=complex)
-    EzSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_freq), dtype=complex)
-    BxSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_freq), dtype=complex)
-    BySagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_freq), dtype=complex)
-    BzSagittalPlane = np.zeros((ExSagittalPlane.shape[0],ExSagittalPlane.shape[1],self.size_freq), dtype=complex)
-
-    for i in range(self.size_freq):
-      ExSagittalPlane[:,:,i] = np.concatenate([-self.GetFrequencyComponent("Er",  i)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Er",  i)[1:,0,:]])
-      EySagittalPlane[:,:,i] = np.concatenate([-self.GetFrequencyComponent("Eth", i)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Eth", i)[1:,0,:]])
-      EzSagittalPlane[:,:,i] = np.concatenate([ self.GetFrequencyComponent("Ez",  i)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Ez",  i)[1:,0,:]])
-      BxSagittalPlane[:,:,i] = np.concatenate([-self.GetFrequencyComponent("Br",  i)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Br",  i)[1:,0,:]])
-      BySagittalPlane[:,:,i] = np.concatenate([-self.GetFrequencyComponent("Bth", i)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Bth", i)[1:,0,:]])
-      BzSagittalPlane[:,:,i] = np.concatenate([ self.GetFrequencyComponent("Bz",  i)[:,self.size_theta//2,:][::-1,:], self.GetFrequencyComponent("Bz",  i)[1:,0,:]])
-
-    return ExSagittalPlane, EySagittalPlane, EzSagittalPlane, BxSagittalPlane,  BySagittalPlane, BzSagittalPlane
+    return tuple(self.GetAxialCutSeries(self.SAGITTAL_CUT, (self.size_theta//2, 0), self.ReadFrequencyColumns,
+                                        range(self.size_freq), self.size_freq, self.complex_dtype))
 
+  @CachedResult
   def GetMeridionalPlaneInFreqCartesian(self):
     """
     Returns the Cartesian components of the electromagnetic field in a given
     y plane, known as the meridional plane, as a function of frequency.
     """
-    # Test to figure out the array size.
-    ExMeridionalPlane = np.concatenate([ self.GetFrequencyComponent("Eth", 0)[:,3*self.size_theta//4,:][::-1,:], -self.GetFrequencyComponent("Eth", 0)[1:,self.size_theta//4,:]])
-
-    # Set the proper array sizes.
-    ExMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_freq), dtype=complex)
-    EyMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_freq), dtype=complex)
-    EzMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_freq), dtype=complex)
-    BxMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_freq), dtype=complex)
-    ByMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_freq), dtype=complex)
-    BzMeridionalPlane = np.zeros((ExMeridionalPlane.shape[0], ExMeridionalPlane.shape[1],self.size_freq), dtype=complex)
-
-    for i in range(self.size_freq):
-      ExMeridionalPlane[:,:,i] = np.concatenate([ self.GetFrequencyComponent("Eth", i)[:,3*self.size_theta//4,:][::-1,:], -self.GetFrequencyComponent("Eth", i)[1:,self.size_theta//4,:]])
-      EyMeridionalPlane[:,:,i] = np.concatenate([-self.GetFrequencyComponent("Er",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetFrequencyComponent("Er",  i)[1:,self.size_theta//4,:]])
-      EzMeridionalPlane[:,:,i] = np.concatenate([ self.GetFrequencyComponent("Ez",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetFrequencyComponent("Ez",  i)[1:,self.size_theta//4,:]])
-      BxMeridionalPlane[:,:,i] = np.concatenate([ self.GetFrequencyComponent("Bth", i)[:,3*self.size_theta//4,:][::-1,:], -self.GetFrequencyComponent("Bth", i)[1:,self.size_theta//4,:]])
-      ByMeridionalPlane[:,:,i] = np.concatenate([-self.GetFrequencyComponent("Br",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetFrequencyComponent("Br",  i)[1:,self.size_theta//4,:]])
-      BzMeridionalPlane[:,:,i] = np.concatenate([ self.GetFrequencyComponent("Bz",  i)[:,3*self.size_theta//4,:][::-1,:],  self.GetFrequencyComponent("Bz",  i)[1:,self.size_theta//4,:]])
-
-    return ExMeridionalPlane, EyMeridionalPlane, EzMeridionalPlane, BxMeridionalPlane, ByMeridionalPlane, BzMeridionalPlane
+    return tuple(self.GetAxialCutSeries(self.MERIDIONAL_CUT, (3*self.size_theta//4, self.size_theta//4), self.ReadFrequencyColumns,
+                                        range(self.size_freq), self.size_freq, self.complex_dtype))
 
   def PrepareTransverseCuts(self,X_meshgrid,Y_meshgrid,field):
     """
@@ -904,6 +2397,22 @@ class AnalysisRadial:
   UNIT_E_FIELD   = 1.3e18*np.sqrt(4*np.pi*ALPHA)
   UNIT_B_FIELD   = UNIT_E_FIELD/SPEED_OF_LIGHT
 
+  # -- Components of the electromagnetic field, in the order in which they
+  # -- are passed to the functionals.
+  COMPONENTS     = ("Er", "Ez", "Bth")
+
+  # -- Number of timesteps of a plane read at once.
+  PLANE_SERIES_BLOCK = 256
+
+  # -- Default number of steps read ahead by the sweeps (0 to read in turn).
+  PREFETCH_DEPTH     = 2
+
+  # -- Number of frequencies summed at once by SynthesizeTemporalField.
+  SYNTHESIS_CHUNK    = 64
+
+  # -- Default shape of the blocks of the statistics sidecar.
+  STATISTICS_BLOCK   = (32,32)
+
   def __init__(self, **kwargs):
     """
     We attach the HDF5 objects and determine the number of frequency
@@ -920,6 +2429,23 @@ class AnalysisRadial:
       driver = None
       comm   = None
 
+    self.comm             = comm
+
+    # -- Number of steps the sweeps read ahead, on a background thread.
+    self.prefetch_depth   = kwargs.get('prefetch', self.PREFETCH_DEPTH)
+
+    # -- Precision of the working arrays. The reductions, e.g. the energy
+    # -- integrals, are accumulated in double precision in any case.
+    precision             = kwargs.get('precision', 'double')
+    if precision not in PRECISIONS:
+      raise ValueError("Unknown precision {}, expected one of {}.".format(precision, tuple(PRECISIONS)))
+    self.real_dtype, self.complex_dtype = PRECISIONS[precision]
+
+    # -- Cache of the complex frequency components. It can be shared between
+    # -- analysis objects by passing the same frequency_cache.
+    self.frequency_cache  = kwargs.get('frequency_cache', None)
+    if self.frequency_cache is None:
+      self.frequency_cache = ComponentCache(kwargs.get('cache_bytes', ComponentCache.DEFAULT_BYTES))
     self.freq_file_loaded = False
     self.time_file_loaded = False
 
@@ -936,14 +2462,27 @@ class AnalysisRadial:
       if use_mpi:
         self.field_temporal    = h5py.File(kwargs['time_field'], 'r', driver=driver, comm=comm)
       else:
-        self.field_temporal    = h5py.File(kwargs['freq_field'], 'r')
-      self.time_field_loaded = True
+        self.field_temporal    = h5py.File(kwargs['time_field'], 'r')
+      self.time_file_loaded = True
     except (IOError, KeyError):
       pass
 
     if not self.freq_file_loaded and not self.time_file_loaded:
       raise IOError("At least one file must be loaded.")
 
+    # -- Consolidated [component, step, r, z] datasets, present when the files
+    # -- were repacked by ConsolidateFieldFile.
+    self.freq_store = None
+    self.time_store = None
+    if self.freq_file_loaded and FIELD_STORE in self.field_frequency:
+      self.freq_store = OpenFieldStore(self.field_frequency)
+    if self.time_file_loaded and FIELD_STORE in self.field_temporal:
+      self.time_store = OpenFieldStore(self.field_temporal)
+
+    for store in (self.freq_store, self.time_store):
+      if store is not None and tuple(store.attrs['components']) != self.COMPONENTS:
+        raise ValueError("The field store contains the components {}, not {}.".format(tuple(store.attrs['components']),self.COMPONENTS))
+
     # -- Number of components
     if self.freq_file_loaded:
       self.size_freq       = self.field_frequency['/spectrum'].attrs.get("num_spectral_components")[0]
@@ -964,7 +2503,63 @@ class AnalysisRadial:
       self.size_r          = self.coord_r.size
       self.size_z          = self.coord_z.size
 
+    # -- Region of interest, given as roi=dict(r_max=..., z=(z_min, z_max)), in
+    # -- the units of the coordinates, each key being optional. All the reads
+    # -- are then restricted to the points with r <= r_max and
+    # -- z_min <= z <= z_max, and the coordinates and sizes are those of the
+    # -- cropped mesh.
+    self.region          = None
+    self.region_name     = None
+    roi                  = kwargs.get('roi', None)
+    if roi is not None:
+      self.region          = (WindowIndices(self.coord_r[:], None, roi.get('r_max')),
+                              WindowIndices(self.coord_z[:], *roi.get('z', (None, None))))
+      if not all(len(axis) for axis in self.region):
+        raise ValueError("The region of interest {} contains no point of the mesh.".format(roi))
+
+      self.region_name     = "roi(r={}, z={})".format(*self.region)
+      self.coord_r         = self.coord_r[:][np.asarray(self.region[0])]
+      self.coord_z         = self.coord_z[:][np.asarray(self.region[1])]
+      self.size_r          = self.coord_r.size
+      self.size_z          = self.coord_z.size
+
     self.dimensions_mesh = np.array([self.size_r,  self.size_z])
+    self.energy_weights  = None
+    self.cell_volumes    = None
+
+    # -- Work arrays reused by the functionals across the time loops.
+    self.workspace       = Workspace()
+
+    # -- Interpolations of the FFT frequencies on the spectral grid, keyed by
+    # -- the number of samples and the time step (see ComputeLocalSpectrum).
+    self.spectrum_plans  = {}
+
+    # -- Persistent cache of the derived results, enabled with
+    # -- results_cache=True (next to the input files) or a file name.
+    self.results_cache   = None
+    if kwargs.get('results_cache', False):
+      inputs = []
+      if self.time_file_loaded:
+        inputs.append(self.field_temporal.filename)
+      if self.freq_file_loaded:
+        inputs.append(self.field_frequency.filename)
+      cacheFile = kwargs['results_cache']
+      self.results_cache = ResultsCache(inputs, None if cacheFile is True else cacheFile)
+
+    # -- Per-block statistics of the temporal field, enabled with
+    # -- statistics=True (next to the temporal file) or a file name. They are
+    # -- written by BuildStatistics, and used when they match the file.
+    self.statistics      = None
+    self.statistics_file = None
+    if kwargs.get('statistics', False) and self.time_file_loaded:
+      statsFile = kwargs['statistics']
+      self.statistics_file = os.path.splitext(self.field_temporal.filename)[0]+".stats.h5" if statsFile is True else statsFile
+      # -- The first rank reads them, so that all the ranks agree on whether
+      # -- they are used.
+      if self.comm is None or self.comm.Get_rank() == 0:
+        self.statistics = FieldStatistics.Load(self.statistics_file, FileIdentity([self.field_temporal.filename]), self.region_name)
+      if self.comm is not None:
+        self.statistics = self.comm.bcast(self.statistics, root=0)
 
     # -- Temporal information
     if self.freq_file_loaded:
@@ -977,57 +2572,691 @@ class AnalysisRadial:
 
   def GetFrequencyComponent(self,comp,freq):
     """
-    Returns the freq-th frequency component of the electromagnetic field.
+    Returns the freq-th frequency component of the electromagnetic field. The
+    components are kept in the frequency_cache, so the returned array is
+    read-only and must be copied before being modified.
+    """
+    key = (self.field_frequency.filename, comp, freq, self.complex_dtype, self.region_name)
+    return self.frequency_cache.Get(key, lambda: self.ReadFrequencyComponent(comp, freq))
+
+  def FileSelection(self,selection=()):
+    """
+    Maps a selection (a tuple of indices over the mesh) to the corresponding
+    selection in the files, which differ when a region of interest is set.
+    """
+    if self.region is None:
+      return selection
+
+    return ComposeSelection(self.region, selection)
+
+  def ReadFrequencyComponent(self,comp,freq,selection=()):
+    """
+    Reads a selection (a tuple of indices over the mesh, the whole mesh by
+    default) of the freq-th frequency component of the electromagnetic field
+    from the file, bypassing the cache.
     """
+    selection = self.FileSelection(selection)
+    if self.freq_store is not None:
+      return self.freq_store[(self.COMPONENTS.index(comp),freq)+selection].astype(self.complex_dtype, copy=False)
+
     amplitude = self.field_frequency['/field/{}-{}/amplitude'.format(comp,freq)]
     phase     = self.field_frequency['/field/{}-{}/phase'.format(comp,freq)]
-    return np.array(amplitude[:]*np.exp(1j*phase[:]),dtype=complex)
+    return np.array(amplitude[selection]*np.exp(1j*phase[selection]), dtype=self.complex_dtype)
 
   def GetTemporalComponent(self,comp,time):
     """
-    Returns the time-th temporal component of the electromagnetic field.
+    Returns the time-th temporal component of the electromagnetic field. This is
+    the HDF5 dataset itself, except for consolidated files or when a region of
+    interest is set, where the array is read.
+    """
+    if self.time_store is not None:
+      return self.time_store[(self.COMPONENTS.index(comp),time)+self.FileSelection()].astype(self.real_dtype, copy=False)
+
+    dataset = self.field_temporal['/field/{}-{}'.format(comp,time)]
+    return dataset if self.region is None else dataset[self.FileSelection()]
+
+  def ReadTemporalComponent(self,comp,timeIdx,out,selection=()):
+    """
+    Reads a selection (a tuple of slices over the mesh) of the time-th temporal
+    component comp directly into out, from either file layout.
+    """
+    selection = self.FileSelection(selection)
+    if self.time_store is not None:
+      self.time_store.read_direct(out, source_sel=(self.COMPONENTS.index(comp),timeIdx)+selection)
+    else:
+      self.field_temporal['/field/{}-{}'.format(comp,timeIdx)].read_direct(out, source_sel=selection or None)
+
+  def AllocateTemporalBundle(self):
+    """
+    Allocates a block that holds the three components of the field at a single
+    timestep. The block is indexed as [component, r, z], in the order given by
+    COMPONENTS, so that it can be unpacked directly into any of the
+    functionals, i.e. emFunc(*bundle).
+    """
+    return np.empty((len(self.COMPONENTS),self.size_r,self.size_z), dtype=self.real_dtype)
+
+  def GetTemporalBundle(self,timeIdx,bundle=None):
+    """
+    Reads the three components of the time-th temporal field into bundle, which
+    is allocated if none is given. Each dataset is read exactly once.
     """
-    return self.field_temporal['/field/{}-{}'.format(comp,time)]
+    if bundle is None:
+      bundle = self.AllocateTemporalBundle()
+
+    for c, comp in enumerate(self.COMPONENTS):
+      self.ReadTemporalComponent(comp, timeIdx, bundle[c])
+
+    return bundle
+
+  def GetTemporalPlaneBundle(self,timeIdx,z_idx):
+    """
+    Reads the three components of the time-th temporal field in the plane
+    z_idx only. The block is indexed as [component, r, 1].
+    """
+    bundle = np.empty((len(self.COMPONENTS),self.size_r,1), dtype=self.real_dtype)
+    for c, comp in enumerate(self.COMPONENTS):
+      self.ReadTemporalComponent(comp, timeIdx, bundle[c], np.s_[:,z_idx:z_idx+1])
+
+    return bundle
+
+  def AllocateRegionBundle(self,selection):
+    """
+    Allocates a block that holds the three components of the field in a
+    selection of the mesh, as read by GetTemporalRegionBundle.
+    """
+    shape = np.empty((self.size_r,self.size_z), dtype=bool)[selection].shape
+    return np.empty((len(self.COMPONENTS),)+shape, dtype=self.real_dtype)
+
+  def GetTemporalRegionBundle(self,timeIdx,selection,bundle=None):
+    """
+    Reads the three components of the time-th temporal field in a selection
+    (a tuple of slices) of the mesh, into bundle if one is given. The block is
+    indexed as [component, r, z].
+    """
+    if bundle is None:
+      bundle = self.AllocateRegionBundle(selection)
+
+    for c, comp in enumerate(self.COMPONENTS):
+      self.ReadTemporalComponent(comp, timeIdx, bundle[c], selection)
+
+    return bundle
+
+  def GetTemporalPlaneSeries(self,z_idx,timeIndices=None,out=None):
+    """
+    Returns the three components of the field in the plane z_idx for the given
+    timesteps (all of them if none are given), as a block indexed as
+    [component, r, t]. For consolidated files, the block is read with a single
+    hyperslab. If out is given, e.g. a view of a larger block, the components
+    are read into it one step at a time instead, so that no other array of
+    its size is allocated.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+
+    if out is None and self.time_store is not None and isinstance(timeIndices, range) and timeIndices.step == 1:
+      block = self.time_store[(slice(None),slice(timeIndices.start,timeIndices.stop))+self.FileSelection(np.s_[:,z_idx])]
+      return np.ascontiguousarray(np.moveaxis(block, 1, -1), dtype=self.real_dtype)
+
+    block = np.empty((len(self.COMPONENTS),self.size_r,len(timeIndices)), dtype=self.real_dtype) if out is None else out
+    line  = np.empty((self.size_r), dtype=self.real_dtype)
+    for n, i in enumerate(timeIndices):
+      for c, comp in enumerate(self.COMPONENTS):
+        self.ReadTemporalComponent(comp, i, line, np.s_[:,z_idx])
+        block[c,:,n] = line
+
+    return block
+
+  def SpectralTimes(self):
+    """
+    Returns the times (in s) resolved by the spectral components: one period
+    1/dnu, for the smallest spacing dnu of the frequencies, centred on zero and
+    sampled at the Nyquist rate of the highest frequency.
+    """
+    nu = self.omega[:]
+    if nu.size < 2:
+      raise ValueError("The times are required to synthesize the field from a single frequency.")
+
+    period = 1.0/np.min(np.diff(nu))
+    size   = int(np.ceil(2.0*nu[-1]*period))
+    return (np.arange(size)-size//2)*(period/size)
+
+  @CachedResult
+  def SynthesizeTemporalField(self,times=None,region=(),components=None,chunkSize=None):
+    r"""
+    Synthesizes the temporal field from the spectral components of the
+    frequency file, at the given times (in s). They default to those of the
+    temporal file or, if it is not loaded, to those of SpectralTimes. The field
+    is synthesized in a region of the mesh. region is a tuple of indices or slices
+    over (r, z), e.g. np.s_[:,z_idx] for a plane, the whole mesh by default.
+
+    The spectral components are taken as the one-sided Fourier transform of
+    the field, i.e.
+    ..math::
+        E(t) = 2 \Re \int_0^\infty \tilde{E}(\nu) e^{-2i\pi\nu t} d\nu,
+
+    where the integral is a midpoint sum over the frequencies of the file.
+    Since these need not start at zero nor be evenly spaced, the inverse
+    transform is done by matrix products with the phase factors rather than by
+    an inverse FFT. The frequencies are streamed by chunks of chunkSize
+    (SYNTHESIS_CHUNK by default) so that the memory stays bounded, and the
+    chunks are split between the MPI ranks.
+
+    Returns a block indexed as [component, region..., t], with the components
+    in the order of components (COMPONENTS by default).
+    """
+    if times is None:
+      times = self.time[:] if self.time_file_loaded else self.SpectralTimes()
+    if components is None:
+      components = self.COMPONENTS
+    if chunkSize is None:
+      chunkSize = self.SYNTHESIS_CHUNK
+
+    times   = np.asarray(times, dtype=float)
+    nu      = self.omega[:]
+    weights = np.diff(CellEdges(nu))
+    shape   = np.empty((self.size_r,self.size_z), dtype=bool)[region].shape
+    field   = np.zeros((len(components)*int(np.prod(shape)),times.size), dtype=self.real_dtype)
+
+    def ReadChunk(chunk, buffer):
+      spectra = np.empty((len(chunk),len(components))+shape, dtype=self.complex_dtype)
+      for n, i in enumerate(chunk):
+        for c, comp in enumerate(components):
+          spectra[n,c] = self.ReadFrequencyComponent(comp, i, region)
+      return spectra.reshape(len(chunk),-1)
+
+    chunks = [range(start, min(start+chunkSize, nu.size)) for start in range(0, nu.size, chunkSize)]
+    local  = [chunks[n] for n in self.DistributeIndices(len(chunks))]
+    for chunk, spectra in self.Sweep(ReadChunk, local, [None]*(self.prefetch_depth+1)):
+      # -- Re(S^T P) for the phase factors P of this chunk of frequencies.
+      phase  = weights[chunk,np.newaxis]*np.exp(-2j*np.pi*nu[chunk,np.newaxis]*times[np.newaxis,:])
+      field += np.dot(spectra.real.T, phase.real.astype(self.real_dtype))
+      field -= np.dot(spectra.imag.T, phase.imag.astype(self.real_dtype))
+    self.ReduceSum(field)
+
+    field *= 2.0
+    return field.reshape((len(components),)+shape+(times.size,))
+
+  def IterateTemporalBundles(self,timeIndices=None):
+    """
+    Iterates over the given timesteps (all of them if none are given) and
+    yields (timeIdx, bundle) pairs. The timesteps are prefetched into a ring
+    of prefetch_depth+1 bundles, which are reused in turn, so the content of a
+    bundle is only valid until the next iteration.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+
+    buffers = [self.AllocateTemporalBundle() for n in range(self.prefetch_depth+1)]
+    yield from self.Sweep(self.GetTemporalBundle, timeIndices, buffers)
+
+  def Sweep(self,read,indices,buffers):
+    """
+    Iterates over indices and yields (i, read(i, buffer)) pairs, cycling
+    through the given buffers. The next prefetch_depth steps are read on a
+    background thread while the caller processes the current one (see
+    Prefetch). With prefetch_depth=0, the steps are simply read in turn, into
+    the first buffer.
+    """
+    if self.prefetch_depth == 0:
+      for i in indices:
+        yield i, read(i, buffers[0])
+      return
+
+    yield from Prefetch(read, indices, buffers)
+
+  def DistributeIndices(self,loopsize):
+    """
+    Returns the range of the indices of a loop of size loopsize that are
+    processed by this rank. The loop is split in contiguous blocks whose sizes
+    differ by at most one (see vphys.StaticPartition). Without MPI, the whole
+    loop is returned.
+    """
+    if self.comm is None:
+      return range(loopsize)
+
+    return vphys.StaticPartition(np.ones(loopsize), self.comm.Get_size())[self.comm.Get_rank()]
+
+  def ReduceSum(self,*arrays):
+    """
+    Sums the given arrays over all the ranks, in place. The sweeps fill the
+    elements they own and leave the others to zero, so that this combines
+    their results. Without MPI, this does nothing.
+    """
+    if self.comm is not None:
+      from mpi4py import MPI
+      for array in arrays:
+        self.comm.Allreduce(MPI.IN_PLACE, array, op=MPI.SUM)
+
+    return arrays
+
+  def ReduceMax(self,value):
+    """
+    Returns the maximum of the scalar value over all the ranks. Without MPI,
+    this returns value.
+    """
+    if self.comm is not None:
+      from mpi4py import MPI
+      value = self.comm.allreduce(value, op=MPI.MAX)
+
+    return value
+
+  def EvaluateFunctionals(self,bundle,*functionals):
+    """
+    Evaluates any number of functionals on the same timestep bundle and
+    returns the list of their values.
+    """
+    return [func(*bundle) for func in functionals]
 
   def FindMaximumValues(self,emFunc=None):
     """
     This finds the maximum value of a given function of the electromagnetic
     field. If none, it computes the maximum electric energy density in SI units.
     """
+    if (emFunc==None):
+      emFunc = self.ElectricEnergyDensity
 
-    maxIdx     = np.zeros((self.size_time), dtype=int)
-    maxIndices = np.zeros((self.size_time), dtype=(int,2))
-    maxValue   = np.zeros((self.size_time))
+    if self.FunctionalBound(emFunc, 0) is not None:
+      return self.ScanMaximumValues(emFunc)
 
+    return self.ComputeReductions({"max": (emFunc, "max")})["max"]
+
+  def FindPeak(self,emFunc=None,timeStride=4,spaceStride=2,radius=1,candidates=4):
+    """
+    Quick-look search of the maximum of emFunc (the electric energy density by
+    default) over all the timesteps, in two stages. The functional is first
+    evaluated on a subsample that keeps one timestep in timeStride and one
+    point in spaceStride along each axis of the mesh. The maxima of the
+    candidates best subsampled timesteps are then refined at full resolution,
+    within radius strides of them in time and in space.
+
+    This reads a small fraction of the data read by FindMaximumValues, but can
+    miss maxima that are narrower than the strides. When the statistics bound
+    emFunc (see FunctionalBound), the search is exact instead: the timesteps
+    and their blocks are read by decreasing bound, until none can beat the
+    maximum found so far, and the strides are not used. Returns the timestep, the
+    (r_idx, z_idx) indices and the value of the maximum.
+    """
     if (emFunc==None):
       emFunc = self.ElectricEnergyDensity
 
-    for i in range(self.size_time):
+    if self.FunctionalBound(emFunc, 0) is not None:
+      return self.ScanPeak(emFunc)
+
+    return self.StridedPeak(emFunc, timeStride, spaceStride, radius, candidates)
+
+  @CachedResult
+  def StridedPeak(self,emFunc,timeStride,spaceStride,radius,candidates):
+    """
+    The approximate two-stage search of FindPeak, which does not use the
+    statistics.
+    """
+    # -- Stage 1: maxima of the subsampled timesteps, on the subsampled mesh.
+    coarse  = np.s_[::spaceStride,::spaceStride]
+    steps   = range(0, self.size_time, timeStride)
+    indices = np.zeros((len(steps),2), dtype=int)
+    values  = np.zeros((len(steps)))
+    buffers = [self.AllocateRegionBundle(coarse) for n in range(self.prefetch_depth+1)]
+
+    local   = self.DistributeIndices(len(steps))
+    for n, (i, bundle) in zip(local, self.Sweep(lambda i, buffer: self.GetTemporalRegionBundle(i, coarse, buffer),
+                                                [steps[n] for n in local], buffers)):
+      value      = np.broadcast_to(emFunc(*bundle), bundle.shape[1:])
+      indices[n] = np.unravel_index(np.argmax(value), value.shape)
+      values[n]  = value[tuple(indices[n])]
+    self.ReduceSum(indices, values)
+    indices *= spaceStride
+
+    # -- Stage 2: full resolution around the best candidates. The windows of
+    # -- neighbouring candidates can coincide, and are then read only once.
+    window = radius*spaceStride
+    tasks  = []
+    seen   = set()
+    for n in np.argsort(values)[::-1][:candidates]:
+      r_idx, z_idx = indices[n]
+      selection = (slice(max(r_idx-window,0), r_idx+window+1), slice(max(z_idx-window,0), z_idx+window+1))
+      for i in range(max(steps[n]-radius*timeStride,0), min(steps[n]+radius*timeStride+1,self.size_time)):
+        key = (i, selection[0].start, selection[0].stop, selection[1].start, selection[1].stop)
+        if key not in seen:
+          seen.add(key)
+          tasks.append((i, selection))
+
+    indices = np.zeros((len(tasks),2), dtype=int)
+    values  = np.zeros((len(tasks)))
+    local   = self.DistributeIndices(len(tasks))
+    for n, ((i, selection), bundle) in zip(local, self.Sweep(lambda task, buffer: self.GetTemporalRegionBundle(*task),
+                                                             [tasks[n] for n in local], [None]*(self.prefetch_depth+1))):
+      value      = np.broadcast_to(emFunc(*bundle), bundle.shape[1:])
+      r_idx, z_idx = np.unravel_index(np.argmax(value), value.shape)
+      indices[n] = (selection[0].start+r_idx, selection[1].start+z_idx)
+      values[n]  = value[r_idx,z_idx]
+    self.ReduceSum(indices, values)
+
+    best = np.argmax(values)
+    return tasks[best][0], tuple(int(idx) for idx in indices[best]), values[best]
+
+  def ComputeFocalVolume(self, emFunc=None, fraction=0.5, maxValues=None, stopAfterPeak=False):
+    """
+    Computes, for each timestep, the focal volume: the volume (in m^3) of the
+    cells in which emFunc (the electric energy density by default) is at least
+    fraction times its global maximum. maxValues are the maxima of emFunc at
+    each timestep, as returned by FindMaximumValues. If they are not given,
+    FindMaximumValues is called first, which takes its own sweep (unless it is
+    cached or uses the statistics): the savings below only pay off in full
+    when maxValues are passed in.
+
+    The volume vanishes at the timesteps whose maximum is below the level, so
+    only the other ones are read, and the volumes of the former are zero. With
+    stopAfterPeak, the pass stops after the timestep of the global maximum,
+    whose volume is usually the one of interest, and the volumes of the later
+    timesteps, which are not evaluated, are NaN. When the statistics bound
+    emFunc, only the blocks that can reach the level are read (see
+    ScanFocalVolumes).
+    """
+    if (emFunc==None):
+      emFunc = self.ElectricEnergyDensity
+    if maxValues is None:
+      maxIndices, maxValues = self.FindMaximumValues(emFunc)
+
+    peak    = np.argmax(maxValues)
+    level   = fraction*maxValues[peak]
+    last    = peak+1 if stopAfterPeak else len(maxValues)
+    steps   = [i for i in range(last) if maxValues[i] >= level]
+
+    volumes = np.zeros((len(maxValues)))
+    volumes[last:] = np.nan
+    if self.FunctionalBound(emFunc, 0) is not None:
+      volumes[steps] = self.ScanFocalVolumes(emFunc, level, steps)
+    else:
+      volumes[steps] = self.ComputeReductions({"volume": (emFunc, "volume", level)}, timeIndices=steps)["volume"]
+    return volumes
+
+  def BuildStatistics(self,blockShape=None):
+    """
+    Sweeps the temporal file once and writes the minimum, maximum and maximum
+    absolute value of each component over blocks of blockShape points
+    (STATISTICS_BLOCK by default), for each timestep, in the statistics file
+    (see FieldStatistics), which the next analyses of the same file use. Returns
+    the statistics.
+    """
+    if blockShape is None:
+      blockShape = self.STATISTICS_BLOCK
+    if self.statistics_file is None:
+      self.statistics_file = os.path.splitext(self.field_temporal.filename)[0]+".stats.h5"
+
+    blocks  = tuple(-(-size//block) for size, block in zip(self.dimensions_mesh, blockShape))
+    minimum = np.zeros((len(self.COMPONENTS),self.size_time)+blocks)
+    maximum = np.zeros((len(self.COMPONENTS),self.size_time)+blocks)
+    for i, bundle in self.IterateTemporalBundles(self.DistributeIndices(self.size_time)):
       if (i % 100 == 0):
-        print("Analyzing temporal component {}/{}".format(i,self.size_time))
+        print("Indexing temporal component {}/{}".format(i,self.size_time))
+      minimum[:,i] = BlockReduce(np.minimum, bundle, blockShape)
+      maximum[:,i] = BlockReduce(np.maximum, bundle, blockShape)
+    self.ReduceSum(minimum, maximum)
+
+    self.statistics = FieldStatistics(blockShape, minimum, maximum, np.maximum(maximum, -minimum))
+    if self.comm is None or self.comm.Get_rank() == 0:
+      self.statistics.Save(self.statistics_file, FileIdentity([self.field_temporal.filename]), self.region_name)
+    return self.statistics
+
+  def FunctionalBound(self,emFunc,timeIdx):
+    """
+    Returns an upper bound of emFunc on each block of the statistics at the
+    time-th timestep, or None if there are no statistics or if emFunc is not
+    one of the functionals we know how to bound. The bounds are slightly
+    widened to absorb the rounding of the single precision.
+    """
+    if self.statistics is None:
+      return None
+
+    absmax = self.statistics.absmax[:,timeIdx]
+    if emFunc in (self.ElectricEnergyDensity, self.MagneticEnergyDensity, self.ElectromagneticEnergyDensity,
+                  self.Er, self.Ez, self.Bth):
+      # -- These grow with the magnitude of each component.
+      bound = emFunc(*absmax)
+    else:
+      return None
+    return bound*(1+1e-5)
+
+  def ScanBlocks(self,emFunc,timeIdx,floor,best=None):
+    """
+    Evaluates emFunc on the blocks of the time-th timestep that can beat
+    floor, by decreasing bound, raising floor to the largest value found so
+    far. best is the (timestep, indices) key of the maximum that reached
+    floor, if it is known. A value equal to floor only beats it at a lower
+    key, so that ties go to the lowest timestep and indices, as with a full
+    sweep. Returns the key and the value of the maximum, or (None, floor) if
+    no block can beat floor.
+    """
+    bound = self.FunctionalBound(emFunc, timeIdx)
+    found = None
+    for block in np.argsort(-bound, axis=None, kind='stable'):
+      selection = self.statistics.Selection(np.unravel_index(block, bound.shape))
+      if bound.flat[block] < floor:
+        break
+      if bound.flat[block] == floor and best is not None and (timeIdx,)+tuple(s.start for s in selection) >= best:
+        continue
+
+      bundle    = self.GetTemporalRegionBundle(timeIdx, selection)
+      value     = emFunc(*bundle)
+      blockMax  = np.unravel_index(np.argmax(value), value.shape)
+      key       = (timeIdx,)+tuple(s.start+idx for s, idx in zip(selection, blockMax))
+      if value[blockMax] > floor or (value[blockMax] == floor and (best is None or key < best)):
+        floor   = value[blockMax]
+        found   = best = key
 
-      func_value  = emFunc(self.GetTemporalComponent("Er", i),
-                           self.GetTemporalComponent("Ez", i),
-                           self.GetTemporalComponent("Bth", i))
+    return found, floor
 
-      maxIdx[i]    = np.argmax(func_value)
-      maxIndices[i]= np.unravel_index(maxIdx[i],(self.size_r,self.size_z))
-      maxValue[i]  = func_value[maxIndices[i][0],maxIndices[i][1]]
+  @CachedResult
+  def ScanMaximumValues(self,emFunc):
+    """
+    Computes the maxima of FindMaximumValues with the statistics: at each
+    timestep, the blocks are read by decreasing bound on emFunc, until none
+    can beat the maximum found so far (see ScanBlocks).
+    """
+    maxIndices = np.zeros((self.size_time,2), dtype=int)
+    maxValue   = np.zeros((self.size_time))
+    for i in self.DistributeIndices(self.size_time):
+      if (i % 100 == 0):
+        print("Analyzing temporal component {}/{}".format(i,self.size_time))
+      best, maxValue[i] = self.ScanBlocks(emFunc, i, -np.inf)
+      maxIndices[i]     = best[1:]
+    self.ReduceSum(maxIndices, maxValue)
 
     return maxIndices, maxValue
 
-  def FindTemporalFocalPlane(self, maxFunc=None, storeFunc=None):
+  @CachedResult
+  def ScanPeak(self,emFunc):
+    """
+    Finds the maximum of emFunc over all the timesteps with the statistics.
+    The timesteps are visited by decreasing bound, dealt round-robin to the
+    ranks, which share the largest maximum found so far after each round. The
+    search stops as soon as no remaining timestep can beat it. Ties go to the
+    lowest timestep and indices, as with a full sweep. Returns the timestep,
+    the indices and the value of the maximum, as FindPeak.
+    """
+    bounds  = np.array([np.max(self.FunctionalBound(emFunc, i)) for i in range(self.size_time)])
+    order   = np.argsort(-bounds, kind='stable')
+    rank, nprocs = (0, 1) if self.comm is None else (self.comm.Get_rank(), self.comm.Get_size())
+
+    # -- Each rank records its maximum at its timestep, the others stay zero.
+    # -- floor is the largest maximum over all the ranks, and value the one of
+    # -- this rank, found at best.
+    found   = np.zeros((self.size_time))
+    indices = np.zeros((self.size_time,2), dtype=int)
+    values  = np.zeros((self.size_time))
+    best    = None
+    value   = -np.inf
+    floor   = -np.inf
+    for start in range(0, self.size_time, nprocs):
+      if bounds[order[start]] < floor:
+        break
+      if start+rank < self.size_time:
+        i = order[start+rank]
+        if bounds[i] >= floor:
+          key, floor = self.ScanBlocks(emFunc, i, floor, best if value == floor else None)
+          if key is not None:
+            best, value = key, floor
+      floor = self.ReduceMax(floor)
+    if best is not None:
+      found[best[0]], indices[best[0]], values[best[0]] = 1.0, best[1:], value
+    self.ReduceSum(found, indices, values)
+
+    best = np.flatnonzero(found)[np.argmax(values[found > 0])]
+    return int(best), tuple(int(idx) for idx in indices[best]), values[best]
+
+  @CachedResult
+  def ScanFocalVolumes(self,emFunc,level,timeIndices):
+    """
+    Computes the volumes of the cells in which emFunc is at least level, as
+    the "volume" reduction of ComputeReductions, for the given timesteps.
+    Only the blocks whose bound reaches the level are read.
+    """
+    volumes = np.zeros((len(timeIndices)))
+    cells   = self.GetCellVolumes()
+    for n in self.DistributeIndices(len(timeIndices)):
+      bound = self.FunctionalBound(emFunc, timeIndices[n])
+      for block in zip(*np.nonzero(bound >= level)):
+        selection = self.statistics.Selection(block)
+        bundle    = self.GetTemporalRegionBundle(timeIndices[n], selection)
+        value     = emFunc(*bundle)
+        volumes[n] += np.sum(cells[selection], where=value >= level, dtype=np.float64)
+    self.ReduceSum(volumes)
+
+    return volumes
+
+  @CachedResult
+  def ComputeReductions(self,reductions,timeIndices=None):
+    """
+    Computes several reductions of functionals of the field in a single pass
+    over the temporal file, for the given timesteps (all of them if none are
+    given). reductions maps names of our choosing to tuples
+    (functional, kind[, argument]), where kind is one of
+      - "max":      the (maxIndices, maxValue) pair of FindMaximumValues,
+      - "integral": the volume integral of the functional, in grid units,
+      - "plane":    the functional on the plane z_idx=argument, as an
+                    (r, time) array,
+      - "point":    the time series of the functional at the point
+                    argument=(r_idx, z_idx),
+      - "volume":   the volume (in m^3) of the cells in which the functional
+                    is at least argument, see GetCellVolumes.
+    Each timestep is read once, and each functional is evaluated once per
+    timestep, however many reductions use it. Returns a dictionary with the
+    same keys as reductions.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+    size = len(timeIndices)
+
+    results = {}
+    for name, (func, kind, *argument) in reductions.items():
+      if kind == "max":
+        results[name] = (np.zeros((size,2), dtype=int), np.zeros((size)))
+      elif kind == "plane":
+        results[name] = np.zeros((self.size_r,size), dtype=self.real_dtype)
+      elif kind in ("integral", "point", "volume"):
+        results[name] = np.zeros((size))
+      else:
+        raise ValueError("Unknown reduction {} for {}.".format(kind, name))
+
+    if any(kind == "integral" for func, kind, *argument in reductions.values()):
+      weights = self.GetEnergyWeights()
+    if any(kind == "volume" for func, kind, *argument in reductions.values()):
+      volumes = self.GetCellVolumes()
+
+    # -- Each functional that accepts out= writes its values in its own work
+    # -- array, which is reused from one timestep to the next.
+    outputs = {}
+    for func, kind, *argument in reductions.values():
+      if func not in outputs:
+        outputs[func] = "value{}".format(len(outputs)) if "out" in inspect.signature(func).parameters else None
+
+    local = self.DistributeIndices(size)
+    for n, (i, bundle) in zip(local, self.IterateTemporalBundles([timeIndices[n] for n in local])):
+      if (i % 100 == 0):
+        print("Analyzing temporal component {}/{}".format(i,self.size_time))
+
+      # -- Functionals shared by several reductions are only evaluated once.
+      # -- Constant functionals (e.g. G in the radial case) are broadcast.
+      values = {}
+      for name, (func, kind, *argument) in reductions.items():
+        if func not in values:
+          if outputs[func] is None:
+            value = func(*bundle)
+          else:
+            value = func(*bundle, out=self.WorkArray(outputs[func], bundle[0]))
+          values[func] = np.broadcast_to(value, bundle.shape[1:])
+        value = values[func]
+
+        if kind == "max":
+          maxIndices, maxValue = results[name]
+          maxIndices[n] = np.unravel_index(np.argmax(value), value.shape)
+          maxValue[n]   = value[tuple(maxIndices[n])]
+        elif kind == "integral":
+          results[name][n] = np.einsum('ij,ij->', value, weights, dtype=np.float64)
+        elif kind == "volume":
+          results[name][n] = np.sum(volumes, where=value >= argument[0], dtype=np.float64)
+        elif kind == "plane":
+          results[name][...,n] = value[...,argument[0]]
+        else:
+          results[name][n] = value[tuple(argument[0])]
+
+    for result in results.values():
+      self.ReduceSum(*(result if isinstance(result, tuple) else (result,)))
+
+    return results
+
+  @CachedResult
+  def FindTemporalFocalPlane(self, maxFunc=None, storeFunc=None, onePass=False, maxCandidates=4):
     """
     We determine the position of the focal plane by the plane containing the point
     at maxFunc is highest. We then return two arrays
     containing the temporal evolution of the focal point and the temporal evolution
     of the focal plane for the functional storeFunc.
+
+    With onePass, the maxima and the focal plane are determined in a single sweep
+    over time: storeFunc is recorded in the planes that contain the running
+    maximum (see FocalPlaneCandidates), and only the missing timesteps of the
+    final focal plane are read again, one plane at a time.
     """
     if (maxFunc==None):
       maxFunc = self.ElectricEnergyDensity
     if (storeFunc==None):
       storeFunc = self.Ez
 
+    if (onePass):
+      def EvaluatePlane(timeIdx, z_idx, bundle):
+        if bundle is None:
+          plane = self.GetTemporalPlaneBundle(timeIdx, z_idx)
+        else:
+          plane = bundle[...,z_idx:z_idx+1]
+        return np.array(storeFunc(*plane)[...,0])
+
+      maxIndices = np.zeros((self.size_time), dtype=(int,2))
+      maxValue   = np.zeros((self.size_time))
+      candidates = FocalPlaneCandidates(EvaluatePlane, maxCandidates)
+
+      localIndices = self.DistributeIndices(self.size_time)
+      for i, bundle in self.IterateTemporalBundles(localIndices):
+        if (i % 100 == 0):
+          print("Analyzing temporal component {}/{}".format(i,self.size_time))
+
+        func_value    = maxFunc(*bundle)
+        maxIndices[i] = np.unravel_index(np.argmax(func_value),(self.size_r,self.size_z))
+        maxValue[i]   = func_value[maxIndices[i][0],maxIndices[i][1]]
+        candidates.Update(i, bundle, maxIndices[i][1], maxValue[i])
+
+      self.ReduceSum(maxIndices, maxValue)
+      focalPointMaxIdxTime = np.argmax(maxValue)
+      print("Maximum of the functional {} is {}".format(maxFunc.__name__,maxValue[focalPointMaxIdxTime]))
+
+      focalPlaneTime = np.zeros((self.size_r,self.size_time), dtype=self.real_dtype)
+      if (len(localIndices) > 0):
+        focalPlaneTime[:,localIndices.start:localIndices.stop] = candidates.GetPlane(maxIndices[focalPointMaxIdxTime][1], localIndices)
+      self.ReduceSum(focalPlaneTime)
+      focalPointTime = np.array(focalPlaneTime[maxIndices[focalPointMaxIdxTime][0],:])
+
+      return maxIndices, maxValue, focalPointMaxIdxTime, focalPointTime, focalPlaneTime
+
     # -- The determine the positions of the maxima as a function of time.
     maxIndices, maxValue = self.FindMaximumValues(maxFunc)
 
@@ -1037,18 +3266,17 @@ class AnalysisRadial:
 
     # -- We build array containing the temporal evolution of the focal point
     # -- and plane.
-    focalPointTime = np.zeros((self.size_time))
-    focalPlaneTime = np.zeros((self.size_r,self.size_time))
-    for i in range(self.size_time):
-      focalPointTime[i] = storeFunc(self.GetTemporalComponent("Er", i),
-                                    self.GetTemporalComponent("Ez", i),
-                                    self.GetTemporalComponent("Bth", i)) \
-                                    [maxIndices[focalPointMaxIdxTime][0],\
-                                     maxIndices[focalPointMaxIdxTime][1]]
-      focalPlaneTime[:,i] = storeFunc(self.GetTemporalComponent("Er", i),
-                                      self.GetTemporalComponent("Ez", i),
-                                      self.GetTemporalComponent("Bth", i)) \
-                                      [:,maxIndices[focalPointMaxIdxTime][1]]
+    # -- Only the focal plane is read, by blocks of PLANE_SERIES_BLOCK steps.
+    focalPlaneTime = np.zeros((self.size_r,self.size_time), dtype=self.real_dtype)
+    localIndices   = self.DistributeIndices(self.size_time)
+    timeBlocks     = [range(start, min(start+self.PLANE_SERIES_BLOCK, localIndices.stop))
+                      for start in range(localIndices.start, localIndices.stop, self.PLANE_SERIES_BLOCK)]
+    readBlock      = lambda timeBlock, buffer: self.GetTemporalPlaneSeries(maxIndices[focalPointMaxIdxTime][1], timeBlock)
+    for timeBlock, series in self.Sweep(readBlock, timeBlocks, [None]*(self.prefetch_depth+1)):
+      focalPlaneTime[:,timeBlock.start:timeBlock.stop] = storeFunc(*series)
+    self.ReduceSum(focalPlaneTime)
+
+    focalPointTime = np.array(focalPlaneTime[maxIndices[focalPointMaxIdxTime][0],:])
 
     return maxIndices, maxValue, focalPointMaxIdxTime, focalPointTime, focalPlaneTime
 
@@ -1058,25 +3286,37 @@ class AnalysisRadial:
     We will find the radial position at which the functional is maximum,
     and find its radial extension. We will then compute the area with pi*r^2.
     """
-    # -- Find the maximum value of the functional.
-    maxIndex = np.argmax(np.abs(radialInfo))
-    maxValue = radialInfo[maxIndex]
+    width, area = self.ComputeFocalAreaBatch(np.asarray(radialInfo)[:,np.newaxis], threshold)
+    return width[0], area[0]
 
-    # -- Find the radial extension of the maximum.
-    for i in range(maxIndex+1,self.size_r):
-      if (np.abs(radialInfo[i]) < maxValue*threshold):
-        indexPlus = i
-        break;
+  def ComputeFocalAreaBatch(self, radialInfo, threshold, axis=-1):
+    """
+    This computes the radial extension and the focal area, as in
+    ComputeFocalArea, for a stack of radial profiles, e.g. the focal plane as a
+    function of time or of frequency. axis is the axis of radialInfo along which
+    the profiles are stacked. The crossings of the threshold on both sides of
+    the maximum are found with array operations. Profiles that do not fall below
+    the threshold after their maximum get NaN.
+    """
+    radialInfo = np.moveaxis(np.asarray(radialInfo), axis, -1)
+    absInfo    = np.abs(radialInfo)
 
-    indexMinus = -1
-    for i in reversed(range(0,maxIndex)):
-      if (np.abs(radialInfo[i]) < maxValue*threshold):
-        indexMinus = i
-        break;
+    # -- Find the maximum value of each profile.
+    maxIndex   = np.argmax(absInfo, axis=0)
+    maxValue   = np.take_along_axis(radialInfo, maxIndex[np.newaxis,:], axis=0)[0]
+
+    # -- Find the first crossings after and the last crossings before the maxima.
+    below      = absInfo < maxValue*threshold
+    rIndices   = np.arange(self.size_r)[:,np.newaxis]
+    after      = below & (rIndices > maxIndex)
+    before     = below & (rIndices < maxIndex)
+    indexPlus  = np.argmax(after, axis=0)
+    indexMinus = self.size_r-1-np.argmax(before[::-1], axis=0)
 
     # -- Compute the radial extension.
-    width = self.coord_r[indexPlus]-self.coord_r[indexMinus] if (indexMinus != -1) else 2*self.coord_r[indexPlus]
-    width *= self.UNIT_LENGTH
+    coord_r    = self.coord_r[:]
+    width      = np.where(np.any(before, axis=0), coord_r[indexPlus]-coord_r[indexMinus], 2*coord_r[indexPlus])
+    width      = np.where(np.any(after, axis=0), width*self.UNIT_LENGTH, np.nan)
 
     return width/2, np.pi*width**2/4
 
@@ -1086,40 +3326,86 @@ class AnalysisRadial:
     done by computing the Hilbert transform of the given signal, and then
     measuring the FWHM duration.
     """
-        # -- We compute the Hilbert transform.
-    hilbertTransform = signal.hilbert(temporalFunctional)
+    return EnvelopeDurations(temporalFunctional, self.dt)
 
-    # -- We compute the squared envelope.
-    envelope         = np.abs(hilbertTransform)
-    envelopeSq       = np.power(envelope,2)
+  def TemporalDurationMap(self, temporalBlock, axis=-1):
+    """
+    Computes the FWHM durations of the envelope and of the squared envelope,
+    as in TemporalDuration, at every point of a block of temporal signals, e.g.
+    the (r, t) focal plane returned by FindTemporalFocalPlane. axis is
+    the time axis of the block. Returns the two duration maps.
+    """
+    return EnvelopeDurations(temporalBlock, self.dt, axis=axis)
 
-    # -- We compute the FWHM of the beam.
-    maxEnvelope   = np.amax(envelope)
-    maxEnvelopeSq = np.amax(envelopeSq)
-    for i in range(envelope.size):
-      if (envelope[i]>maxEnvelope/2):
-        firstIndex = i
-        break
+  def ComputeLocalSpectrum(self, temporalBlock, axis=-1, dt=None, workers=None):
+    """
+    Computes the power spectrum of every signal of a block of temporal
+    signals, e.g. the (r, t) focal plane returned by FindTemporalFocalPlane,
+    with a single batched real FFT along the time axis (scipy.fft keeps the
+    FFT plans from one call to the next). dt is the time step, that of the
+    temporal file by default, and workers is passed on to scipy.fft.
 
-    for i in reversed(range(envelope.size)):
-      if (envelope[i]>maxEnvelope/2):
-        lastIndex = i
-        break
+    When the frequency file is loaded, the spectra are linearly interpolated
+    on its frequencies (and vanish outside of the FFT band). The interpolation
+    is computed once per number of samples and time step. Returns the
+    frequencies (in Hz) and the spectra, indexed as [..., frequency].
+    """
+    import scipy.fft as fft
+
+    if dt is None:
+      dt = self.dt
+
+    series  = np.moveaxis(np.asarray(temporalBlock), axis, -1)
+    spectra = np.abs(fft.rfft(series, axis=-1, workers=workers))
+    spectra = np.square(spectra, out=spectra)
+    spectra *= dt**2
+    grid    = fft.rfftfreq(series.shape[-1], dt)
+    if not self.freq_file_loaded:
+      return grid, spectra
+
+    key = (series.shape[-1], dt)
+    if key not in self.spectrum_plans:
+      nu     = self.omega[:]
+      index  = np.clip(np.searchsorted(grid, nu)-1, 0, grid.size-2)
+      inside = (nu >= grid[0]) & (nu <= grid[-1])
+      weight = np.where(inside, (nu-grid[index])/(grid[index+1]-grid[index]), 0.0)
+      self.spectrum_plans[key] = (nu, index, weight, inside)
+
+    nu, index, weight, inside = self.spectrum_plans[key]
+    weight = weight.astype(spectra.dtype, copy=False)
+    return nu, (spectra[...,index]*(1-weight)+spectra[...,index+1]*weight)*inside
+
+  def ComputeSpectralMaps(self, temporalBlock, axis=-1, dt=None):
+    """
+    Computes the maps of the spectral centroid and of the RMS bandwidth (in Hz)
+    of a block of temporal signals, from the spectra of ComputeLocalSpectrum.
+    """
+    return SpectralMoments(*self.ComputeLocalSpectrum(temporalBlock, axis=axis, dt=dt))
 
-    envelopeIdx = self.dt*(lastIndex-firstIndex)
+  def GetEnergyWeights(self):
+    """
+    Returns the (r, z) weights of the nested Simpson integrations over the
+    volume, including the Jacobian 2*pi*r. They are computed on the first call
+    only.
+    """
+    if self.energy_weights is None:
+      self.energy_weights = 2.0*np.pi*(SimpsonWeights(self.coord_r[:])*self.coord_r[:])[:,np.newaxis] \
+                                     *SimpsonWeights(self.coord_z[:])[np.newaxis,:]
 
-    for i in range(envelope.size):
-      if (envelopeSq[i]>maxEnvelopeSq/2):
-        firstIndex = i
-        break;
+    return self.energy_weights
 
-    for i in reversed(range(envelope.size)):
-      if (envelopeSq[i]>maxEnvelopeSq/2):
-        lastIndex = i
-        break;
+  def GetCellVolumes(self):
+    """
+    Returns the (r, z) volumes (in m^3) of the annular cells centred on the grid
+    points, 2*pi*r*dr*dz. The cells extend from midpoint to midpoint, the cell
+    at r=0 being a cylinder. They are computed on the first call only.
+    """
+    if self.cell_volumes is None:
+      ring   = np.pi*np.diff(np.square(CellEdges(self.coord_r[:]*self.UNIT_LENGTH)))
+      dz     = np.diff(CellEdges(self.coord_z[:]*self.UNIT_LENGTH))
+      self.cell_volumes = ring[:,np.newaxis]*dz[np.newaxis,:]
 
-    envelopeSqIdx = self.dt*(lastIndex-firstIndex)
-    return envelopeIdx, envelopeSqIdx
+    return self.cell_volumes
 
   def ComputeTotalEnergyDensityTemporal(self, timeIdx):
     """
@@ -1127,77 +3413,189 @@ class AnalysisRadial:
     focus. Since we suppose that all the energy is contained in this volume, the final
     value should not depend on the timeIdx, as long as the whole field is present there.
     """
-    # -- We prepare the array.
-    integrand  = np.zeros((self.size_r,self.size_z))
+    bundle = self.GetTemporalBundle(timeIdx)
+    return 0.5*np.einsum('cij,cij,ij->', bundle, bundle, self.GetEnergyWeights(), dtype=np.float64)*self.UNIT_MASS*self.SPEED_OF_LIGHT**2
+
+  @CachedResult
+  def ComputeTotalEnergyCurve(self, timeIndices=None):
+    """
+    We compute the total energy of the system for each of the given timesteps
+    (all of them if none are given), in a single pass over the temporal file.
+    Each timestep is reduced with one contraction against the precomputed
+    quadrature weights.
+    """
+    if timeIndices is None:
+      timeIndices = range(self.size_time)
+
+    weights = self.GetEnergyWeights()
+    energy  = np.zeros((len(timeIndices)))
+    local   = self.DistributeIndices(len(timeIndices))
 
-    Er         = self.GetTemporalComponent("Er", timeIdx)
-    Ez         = self.GetTemporalComponent("Ez", timeIdx)
-    Bth        = self.GetTemporalComponent("Bth",timeIdx)
+    for n, (i, bundle) in zip(local, self.IterateTemporalBundles([timeIndices[n] for n in local])):
+      energy[n] = 0.5*np.einsum('cij,cij,ij->', bundle, bundle, weights, dtype=np.float64)
 
-    #integrand  = 0.5*(EPSILON_0*UNIT_E_FIELD**2*(Er[:]**2+Ez[:]**2)+MU_0**(-1)*UNIT_B_FIELD**2*Bth[:]**2)
-    integrand   = 0.5*(Er[:]**2+Ez[:]**2+Bth[:]**2)
-    for i in range(integrand.shape[0]):
-      integrand[i,:] *= self.coord_r[i]
+    self.ReduceSum(energy)
 
-    return 2.0*np.pi*integration.simps(integration.simps(integrand,x=self.coord_z[:]),x=self.coord_r[:])*self.UNIT_MASS*self.SPEED_OF_LIGHT**2
+    return energy*self.UNIT_MASS*self.SPEED_OF_LIGHT**2
 
-  def LorentzInvariantF(self,Er,Ez,Bth):
+  def WorkArray(self,name,like):
+    """
+    Returns the work array name of our workspace, shaped like the array like.
+    """
+    return self.workspace.Get(name, np.shape(like), np.result_type(like))
+
+  def LorentzInvariantF(self,Er,Ez,Bth,out=None):
     """
     Computes the Lorentz invariant 0.5*(|E|^2-|B|^2/c^2).
     """
-    magneticMagnitude = np.power(Bth,2)
-    electricMagnitude = np.power(Er,2)+np.power(Ez,2)
+    magneticMagnitude = np.multiply(Bth, Bth, out=self.WorkArray("magnetic", Bth))
+    electricMagnitude = SumOfProducts((Er,Ez), (Er,Ez), out=out, work=self.WorkArray("square", Er))
 
-    return 0.5*(electricMagnitude-magneticMagnitude)
+    electricMagnitude -= magneticMagnitude
+    electricMagnitude *= 0.5
+    return electricMagnitude
 
-  def LorentzInvariantG(self,Er,Ez,Bth):
+  def LorentzInvariantG(self,Er,Ez,Bth,out=None):
     """
     Computes the Lorentz invariant (E \cdot B)/c.
     """
     return 0
 
 
-  def ElectricEnergyDensity(self,Er,Ez,Bth):
+  def ElectricEnergyDensity(self,Er,Ez,Bth,out=None):
     """
     Computes the electric energy intensity in the temporal domain (in W/cm^2).
     """
-    electric_intensity = 0.5*self.SPEED_OF_LIGHT                           \
-                            *self.EPSILON_0                                \
-                            *np.power(self.UNIT_E_FIELD,2)                 \
-                            *(np.power(Er,2)+np.power(Ez,2))
-    return electric_intensity/1e4
+    electric_intensity  = SumOfProducts((Er,Ez), (Er,Ez), out=out, work=self.WorkArray("square", Er))
+    electric_intensity *= 0.5*self.SPEED_OF_LIGHT                          \
+                             *self.EPSILON_0                               \
+                             *np.power(self.UNIT_E_FIELD,2)
+    electric_intensity /= 1e4
+    return electric_intensity
 
-  def MagneticEnergyDensity(self,Er,Ez,Bth):
+  def MagneticEnergyDensity(self,Er,Ez,Bth,out=None):
     """
     Computes the magnetic energy intensity in the temporal domain (in W/cm^2).
     """
-    magnetic_intensity = 0.5*self.SPEED_OF_LIGHT                           \
-                            /self.MU_0                                     \
-                            *np.power(self.UNIT_B_FIELD,2)                 \
-                            *(np.power(Bth,2))
-    return magnetic_intensity/1e4
+    magnetic_intensity  = np.multiply(Bth, Bth, out=out)
+    magnetic_intensity *= 0.5*self.SPEED_OF_LIGHT                          \
+                             /self.MU_0                                    \
+                             *np.power(self.UNIT_B_FIELD,2)
+    magnetic_intensity /= 1e4
+    return magnetic_intensity
 
-  def ElectromagneticEnergyDensity(self,Er,Ez,Bth):
+  def ElectromagneticEnergyDensity(self,Er,Ez,Bth,out=None):
     """
     Computes the total electromagnetic energy density in the temporal domain.
     """
-    em_intensity = ElectricEnergyDensity(Er,Ez,Bth)+MagneticEnergyDensity(Er,Ez,Bth)
+    em_intensity  = self.ElectricEnergyDensity(Er,Ez,Bth,out=out)
+    em_intensity += self.MagneticEnergyDensity(Er,Ez,Bth,out=self.WorkArray("magnetic", Bth))
     return em_intensity
 
-  def Er(self,Er,Ez,Bth):
+  def Er(self,Er,Ez,Bth,out=None):
     """
     Returns the Er component of the electric field (in V/m).
     """
-    return self.UNIT_E_FIELD*Er[:]
+    return np.multiply(self.UNIT_E_FIELD, Er, out=out)
 
-  def Ez(self,Er,Ez,Bth):
+  def Ez(self,Er,Ez,Bth,out=None):
     """
     Return the Ez component of the electric field (in V/m).
     """
-    return self.UNIT_E_FIELD*Ez[:]
+    return np.multiply(self.UNIT_E_FIELD, Ez, out=out)
 
-  def Bth(self,Er,Ez,Bth):
+  def Bth(self,Er,Ez,Bth,out=None):
     """
     Return the Bth component of the electric field (in T).
     """
-    return self.UNIT_B_FIELD*Bth[:]
\ No newline at end of file
+    return np.multiply(self.UNIT_B_FIELD, Bth, out=out)
+
+# ----------------------------- File Conversion ----------------------------- #
+def StoreChunks(mesh, itemsize, nbytes=STORE_CHUNK_BYTES):
+  """
+  Returns the chunk shape of a step of the mesh in the FIELD_STORE: the
+  longest axis of the chunk is halved until it holds at most nbytes.
+  """
+  chunks = list(mesh)
+  while int(np.prod(chunks))*itemsize > nbytes and max(chunks) > 1:
+    axis         = int(np.argmax(chunks))
+    chunks[axis] = (chunks[axis]+1)//2
+
+  return tuple(chunks)
+
+def OpenFieldStore(file):
+  """
+  Opens the FIELD_STORE of a consolidated file, with a chunk cache that holds
+  the chunks of a whole step of a component (within STORE_CACHE_MIN_BYTES and
+  STORE_CACHE_MAX_BYTES), so that the reads of parts of a step, e.g. the
+  blocks of ScanBlocks, do not read the same chunk again.
+  """
+  store  = file[FIELD_STORE]
+  if store.chunks is None:
+    return store
+
+  # -- The dataset is released before it is opened again, since HDF5 would
+  # -- otherwise share the open dataset and its default cache.
+  shape, chunks, itemsize = store.shape, store.chunks, store.dtype.itemsize
+  del store
+
+  count  = int(np.prod([-(-size//chunk) for size, chunk in zip(shape[2:], chunks[2:])]))
+  nbytes = count*int(np.prod(chunks))*itemsize
+  nbytes = min(max(nbytes, STORE_CACHE_MIN_BYTES), STORE_CACHE_MAX_BYTES)
+
+  access = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+  access.set_chunk_cache(max(521, 100*count), nbytes, 1.0)
+  return h5py.Dataset(h5py.h5d.open(file.id, FIELD_STORE.encode(), dapl=access))
+
+def ConsolidateFieldFile(inputFilename, outputFilename, chunks=None):
+  """
+  We repack a time or frequency file of the StrattoCalculator, which stores one
+  dataset per component and per step (/field/Er-<i>), into a single chunked
+  dataset FIELD_STORE indexed as [component, step, r, theta, z], or
+  [component, step, r, z] for radial files. Frequency components are stored as
+  complex numbers. The coordinates, spectrum and time information are copied.
+
+  By default, a chunk contains a single step of a single component, over a
+  block of the mesh that is balanced over its axes (see StoreChunks), so that
+  the sweeps, which read whole steps, touch each chunk once, while planes and
+  columns only read the chunks they cross.
+  """
+  with h5py.File(inputFilename, 'r') as source, h5py.File(outputFilename, 'w') as target:
+    for name in ('coordinates', 'spectrum', 'time'):
+      if name in source:
+        source.copy(name, target)
+
+    # -- We determine the layout of the original file.
+    field      = source['/field']
+    components = [comp for comp in Analysis3D.COMPONENTS if '{}-0'.format(comp) in field]
+    size_steps = len(field)//len(components)
+    frequency  = isinstance(field['{}-0'.format(components[0])], h5py.Group)
+
+    if frequency:
+      mesh  = field['{}-0/amplitude'.format(components[0])].shape
+      dtype = np.dtype(complex)
+    else:
+      mesh  = field['{}-0'.format(components[0])].shape
+      dtype = field['{}-0'.format(components[0])].dtype
+
+    if chunks is None:
+      chunks = (1,1)+StoreChunks(mesh, dtype.itemsize)
+
+    store = target.create_dataset(FIELD_STORE, (len(components),size_steps)+mesh, dtype=dtype, chunks=chunks)
+    store.attrs['components'] = components
+    store.attrs['domain']     = 'frequency' if frequency else 'time'
+
+    # -- We convert chunks[1] steps at a time, so that each chunk is written once.
+    block = np.empty((chunks[1],)+mesh, dtype=dtype)
+    for c, comp in enumerate(components):
+      for start in range(0, size_steps, chunks[1]):
+        stop = min(start+chunks[1], size_steps)
+        for i in range(start, stop):
+          if frequency:
+            amplitude      = field['{}-{}/amplitude'.format(comp,i)]
+            phase          = field['{}-{}/phase'.format(comp,i)]
+            block[i-start] = amplitude[:]*np.exp(1j*phase[:])
+          else:
+            field['{}-{}'.format(comp,i)].read_direct(block[i-start])
+
+        store[c,start:stop] = block[:stop-start]
@@ -0,0 +1,62 @@
+# ------------------------------- Information ------------------------------- #
+# Description:  Fixtures of the tests: small temporal and frequency files of  #
+#               the analysis classes, written in a temporary directory.       #
+# --------------------------------------------------------------------------- #
+
+import os
+import sys
+
+import h5py
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def WriteFiles(directory, components, r, z, theta=None, nt=12, nf=6):
+  """
+  Writes a temporal and a frequency file on the mesh (r, theta, z), or (r, z)
+  without theta, and returns their paths. The temporal field is a pulse that
+  crosses the mesh along z.
+  """
+  coordinates = {'r': r, 'z': z} if theta is None else {'r': r, 'theta': theta, 'z': z}
+  mesh        = np.meshgrid(*coordinates.values(), indexing='ij')
+  R, Z        = mesh[0], mesh[-1]
+
+  timeFile = os.path.join(directory, "time.h5")
+  with h5py.File(timeFile, 'w') as f:
+    for name, values in coordinates.items():
+      f['/coordinates/'+name] = values
+    f['/time'] = np.arange(nt)*0.1e-15
+    for i in range(nt):
+      envelope = np.exp(-(R/15)**2-((Z+40-80*i/(nt-1))/10)**2)
+      for k, comp in enumerate(components):
+        f['/field/{}-{}'.format(comp,i)] = envelope*np.cos(0.7*i+k)
+
+  freqFile = os.path.join(directory, "freq.h5")
+  with h5py.File(freqFile, 'w') as f:
+    for name, values in coordinates.items():
+      f['/coordinates/'+name] = values
+    f['/spectrum/frequency (Hz)'] = np.linspace(1e14, 5e14, nf)
+    f['/spectrum/wavelength (m)'] = 3e8/np.linspace(1e14, 5e14, nf)
+    f['/spectrum'].attrs['num_spectral_components'] = [nf]
+    for i in range(nf):
+      for k, comp in enumerate(components):
+        f['/field/{}-{}/amplitude'.format(comp,i)] = np.exp(-(R/15)**2-(Z/10)**2)*(1+k+i)
+        f['/field/{}-{}/phase'.format(comp,i)]     = 0.1*Z+k
+
+  return timeFile, freqFile
+
+@pytest.fixture
+def files3D(tmp_path):
+  """
+  The (temporal, frequency) files of Analysis3D.
+  """
+  return WriteFiles(str(tmp_path), ("Er","Eth","Ez","Br","Bth","Bz"), np.linspace(0, 50, 12),
+                    np.linspace(-40, 40, 10), theta=np.linspace(0, 2*np.pi, 16, endpoint=False))
+
+@pytest.fixture
+def filesRadial(tmp_path):
+  """
+  The (temporal, frequency) files of AnalysisRadial.
+  """
+  return WriteFiles(str(tmp_path), ("Er","Ez","Bth"), np.linspace(0, 50, 12), np.linspace(-40, 40, 10))
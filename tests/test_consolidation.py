@@ -0,0 +1,48 @@
+# ------------------------------- Information ------------------------------- #
+# Description:  Tests of the consolidated field store.                        #
+# --------------------------------------------------------------------------- #
+
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+import AnalysisStrattoCalculator as asc
+
+@pytest.mark.parametrize("mesh,itemsize", [((12,16,10), 8), ((512,64,1024), 8), ((2048,4096), 16), ((3,1,5000000), 4)])
+def test_store_chunks_are_balanced(mesh, itemsize):
+  chunks = asc.StoreChunks(mesh, itemsize)
+
+  assert all(1 <= chunk <= size for chunk, size in zip(chunks, mesh))
+  assert int(np.prod(chunks))*itemsize <= asc.STORE_CHUNK_BYTES
+  # -- The axes that were split are within a factor of two of each other, and
+  # -- of the axes that were kept whole.
+  split = [chunk for chunk, size in zip(chunks, mesh) if chunk < size]
+  if split:
+    assert max(split) <= 2*min(split)
+    assert max(chunks) <= 2*max(split)
+
+@pytest.mark.parametrize("which", ["files3D", "filesRadial"])
+def test_consolidated_steps_are_chunked_alone(which, request, tmp_path):
+  timeFile, freqFile = request.getfixturevalue(which)
+  for source in (timeFile, freqFile):
+    target = str(tmp_path/("store-"+os.path.basename(source)))
+    asc.ConsolidateFieldFile(source, target)
+
+    # -- A sweep reads whole steps: each chunk must hold one component of a
+    # -- single step, and the cache must hold all the chunks of a step.
+    with h5py.File(target, 'r') as f:
+      store = asc.OpenFieldStore(f)
+      assert store.chunks[:2] == (1, 1)
+      assert store.chunks[2:] == asc.StoreChunks(store.shape[2:], store.dtype.itemsize)
+      slots, nbytes, w0 = store.id.get_access_plist().get_chunk_cache()
+      assert nbytes >= min(int(np.prod(store.shape[2:]))*store.dtype.itemsize, asc.STORE_CACHE_MAX_BYTES)
+
+def test_consolidated_sweeps_match(files3D, tmp_path):
+  target = str(tmp_path/"store.h5")
+  asc.ConsolidateFieldFile(files3D[0], target)
+
+  expected = asc.Analysis3D(time_field=files3D[0]).FindMaximumValues()
+  result   = asc.Analysis3D(time_field=target).FindMaximumValues()
+  assert np.array_equal(expected[0], result[0]) and np.array_equal(expected[1], result[1])
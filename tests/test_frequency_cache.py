@@ -0,0 +1,34 @@
+# ------------------------------- Information ------------------------------- #
+# Description:  Tests of the cache of the frequency components.               #
+# --------------------------------------------------------------------------- #
+
+import numpy as np
+import pytest
+
+import AnalysisStrattoCalculator as asc
+
+@pytest.mark.parametrize("extract", [lambda a: a.GetSagittalPlaneInFreqCartesian(),
+                                     lambda a: a.GetMeridionalPlaneInFreqCartesian(),
+                                     lambda a: a.GetFocalPlaneInFreqCartesian(4)])
+def test_repeated_extraction_hits_the_cache(files3D, extract):
+  analysis = asc.Analysis3D(freq_field=files3D[1])
+  first    = extract(analysis)
+  misses   = analysis.frequency_cache.misses
+  assert misses > 0 and analysis.frequency_cache.hits == 0
+
+  second   = extract(analysis)
+  assert analysis.frequency_cache.hits == misses
+  assert analysis.frequency_cache.misses == misses
+  assert all(np.array_equal(x, y) for x, y in zip(first, second))
+
+def test_extraction_slices_cached_components(files3D):
+  analysis = asc.Analysis3D(freq_field=files3D[1])
+  expected = asc.Analysis3D(freq_field=files3D[1]).GetFocalPlaneInFreqCartesian(4)
+  for i in range(analysis.size_freq):
+    for comp in analysis.COMPONENTS:
+      analysis.GetFrequencyComponent(comp, i)
+
+  misses = analysis.frequency_cache.misses
+  result = analysis.GetFocalPlaneInFreqCartesian(4)
+  assert analysis.frequency_cache.misses == misses
+  assert all(np.array_equal(x, y) for x, y in zip(expected, result))
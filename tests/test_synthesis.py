@@ -0,0 +1,38 @@
+# ------------------------------- Information ------------------------------- #
+# Description:  Tests of the synthesis of the temporal field from the         #
+#               spectral components.                                          #
+# --------------------------------------------------------------------------- #
+
+import numpy as np
+import pytest
+
+import AnalysisStrattoCalculator as asc
+
+def test_frequency_only_3D(files3D):
+  analysis = asc.Analysis3D(freq_field=files3D[1])
+  times    = analysis.SpectralTimes()
+  field    = analysis.SynthesizeTemporalField(region=np.s_[:,0,:])
+
+  assert field.shape == (6, analysis.size_r, analysis.size_z, times.size)
+  assert np.all(np.isfinite(field)) and np.any(field != 0)
+
+def test_frequency_only_radial(filesRadial):
+  analysis = asc.AnalysisRadial(freq_field=filesRadial[1])
+  field    = analysis.SynthesizeTemporalField(region=np.s_[:,0])
+
+  assert field.shape == (3, analysis.size_r, analysis.SpectralTimes().size)
+
+def test_spectral_times_resolve_the_spectrum(files3D):
+  analysis = asc.Analysis3D(freq_field=files3D[1])
+  nu       = analysis.omega[:]
+  times    = analysis.SpectralTimes()
+
+  # -- One period of the frequency spacing, sampled at least at the Nyquist rate.
+  assert times.size*(times[1]-times[0]) == pytest.approx(1.0/np.min(np.diff(nu)))
+  assert times[1]-times[0] <= 1.0/(2.0*nu[-1])
+
+def test_temporal_times_by_default(files3D):
+  analysis = asc.Analysis3D(time_field=files3D[0], freq_field=files3D[1])
+  field    = analysis.SynthesizeTemporalField(region=np.s_[0,0,:])
+
+  assert field.shape[-1] == analysis.size_time
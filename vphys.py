@@ -111,31 +111,167 @@ def BarPlotWithLogAxes(ax_handle,x,y,width, xdelta=0.0, **plot_kwargs):
     return artist
 
 # ------------------------------ MPI Functions ------------------------------ #
-def GenerateIndicesForDifferentProcs(nprocs, loopsize):
+def StaticPartition(costs, nprocs):
+  """
+  Splits a loop whose elements have the given (estimated) costs, for instance
+  the number of bytes of each simulation directory, in nprocs contiguous blocks
+  of roughly equal total cost. An element is assigned to the block in which the
+  midpoint of its cost falls. If all the costs vanish, e.g. for empty
+  directories, the elements are taken to cost the same. Returns the list of the
+  ranges of each block.
+  """
+  import numpy as np
+  costs    = np.asarray(costs, dtype=float)
+  if costs.sum() == 0:
+    costs  = np.ones(costs.size)
+  midpoint = np.cumsum(costs)-costs/2
+  bounds   = np.searchsorted(midpoint, costs.sum()*np.arange(1,nprocs)/nprocs, side='left')
+  bounds   = np.concatenate([[0], bounds, [costs.size]])
+
+  return [range(bounds[i], bounds[i+1]) for i in range(nprocs)]
+
+def GenerateIndicesForDifferentProcs(nprocs, loopsize, rank=None, costs=None):
   """
   Generates a list that contains the elements of the loops that each
-  rank will process. In the case that the number of processors does not divide
-  the loop size, We divide the rest of the work amongst the first (loopsize % nprocs)
-  processors.
+  rank will process. The loop is split in contiguous blocks, of roughly equal
+  sizes or, if costs are given, of roughly equal costs (see StaticPartition).
+  The rank defaults to that of the process in MPI.COMM_WORLD. Ranks without
+  work get None.
+  """
+  import numpy as np
+  if rank is None:
+    from mpi4py import MPI
+    rank = MPI.COMM_WORLD.Get_rank()
+
+  if costs is None:
+    costs = np.ones(loopsize)
+
+  block = StaticPartition(costs, nprocs)[rank]
+  if len(block) == 0:
+    return None
+
+  return np.arange(block.start, block.stop)
+
+def _ApplyToBlock(func, items):
+  """
+  Applies func to a block of items. Used to process static blocks in a
+  multiprocessing pool.
+  """
+  return [func(item) for item in items]
+
+def _ApplyToIndexedItem(func, indexedItem):
+  """
+  Applies func to an (index, item) pair and returns (index, result). Used by
+  the dynamic mode in a multiprocessing pool.
   """
-  rank = MPI.COMM_WORLD.Get_rank()
-  if (nprocs <= loopsize):
-    sizes        = divmod(loopsize,nprocs)
-    indices_rank = np.empty((sizes[0]), dtype=int)
+  index, item = indexedItem
+  return index, func(item)
 
-    for i in range(sizes[0]):
-      indices_rank[i] = rank*sizes[0]+i
+def ScheduleWork(func, items, mode="static", costs=None, comm=None, processes=None):
+  """
+  Applies func to every element of items and returns the list of results, in
+  the order of items.
+
+  In "static" mode, the items are split in contiguous blocks of roughly equal
+  costs (see StaticPartition), one per rank. In "dynamic" mode, the master rank
+  feeds the items, one at a time, to whichever worker is idle, which suits loops
+  whose elements have very different costs. The master rank only dispatches
+  work, so this needs at least two ranks. If func raises on a worker, the
+  exception is sent back, and the master stops handing out work. In both
+  modes, an exception raised on any rank is re-raised on every rank once they
+  have all stopped, so that none of them is left waiting for the others.
+
+  With an MPI communicator, the results are gathered on rank 0, and the other
+  ranks get None. Without one, the same schedule is run on a multiprocessing
+  pool of the given number of processes; func must then be picklable.
+  """
+  import functools
+  import multiprocessing
+  import numpy as np
 
-    if MPI.COMM_WORLD.Get_rank() < sizes[1]:
-      indices_rank = np.append(indices_rank, nprocs+MPI.COMM_WORLD.Get_rank())
+  items = list(items)
+  if costs is None:
+    costs = np.ones(len(items))
 
-  elif (nprocs > loopsize):
-    indices_rank = None
+  if mode not in ("static", "dynamic"):
+    raise ValueError("Unknown scheduling mode {}.".format(mode))
 
-    if rank < loopsize:
-      indices_rank = np.array([rank])
+  # -- Without MPI, we use a pool of processes.
+  if comm is None:
+    if processes is None:
+      processes = multiprocessing.cpu_count()
 
-  return indices_rank
+    with multiprocessing.Pool(processes) as pool:
+      if mode == "static":
+        blocks  = StaticPartition(costs, processes)
+        results = pool.starmap(_ApplyToBlock, [(func, items[block.start:block.stop]) for block in blocks])
+        return [result for block in results for result in block]
+
+      results = [None]*len(items)
+      for index, result in pool.imap_unordered(functools.partial(_ApplyToIndexedItem, func), enumerate(items)):
+        results[index] = result
+      return results
+
+  rank, nprocs = comm.Get_rank(), comm.Get_size()
+
+  if mode == "static" or nprocs == 1:
+    block   = StaticPartition(costs, nprocs)[rank] if mode == "static" else range(len(items))
+    try:
+      outcome = ([func(items[i]) for i in block], None)
+    except Exception as error:
+      outcome = (None, error)
+
+    outcomes = comm.gather(outcome, root=0)
+    error    = next((e for r, e in outcomes if e is not None), None) if rank == 0 else None
+    error    = comm.bcast(error, root=0)
+    if error is not None:
+      raise error
+    if rank != 0:
+      return None
+    return [result for block, e in outcomes for result in block]
+
+  # -- Dynamic mode: the master hands out work items to idle workers.
+  from mpi4py import MPI
+  WORK_TAG, STOP_TAG, ERROR_TAG = 1, 2, 3
+  status = MPI.Status()
+
+  if rank == 0:
+    results = [None]*len(items)
+    error   = None
+    nextIdx = 0
+    active  = nprocs-1
+    while active > 0:
+      message = comm.recv(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status)
+      worker  = status.Get_source()
+      if status.Get_tag() == ERROR_TAG:
+        error = error or message
+      elif message is not None:
+        results[message[0]] = message[1]
+
+      if error is None and nextIdx < len(items):
+        comm.send((nextIdx, items[nextIdx]), dest=worker, tag=WORK_TAG)
+        nextIdx += 1
+      else:
+        comm.send(None, dest=worker, tag=STOP_TAG)
+        active -= 1
+
+    error = comm.bcast(error, root=0)
+    if error is not None:
+      raise error
+    return results
+
+  comm.send(None, dest=0, tag=WORK_TAG)
+  while True:
+    task = comm.recv(source=0, tag=MPI.ANY_TAG, status=status)
+    if status.Get_tag() == STOP_TAG:
+      error = comm.bcast(None, root=0)
+      if error is not None:
+        raise error
+      return None
+    try:
+      comm.send(_ApplyToIndexedItem(func, task), dest=0, tag=WORK_TAG)
+    except Exception as error:
+      comm.send(error, dest=0, tag=ERROR_TAG)
 
 # ------------------------ Cluster-Related Functions ------------------------ #
 
@@ -155,11 +291,24 @@ def ListSimulationDirectories(bin_dir):
 
   return sortedList
 
+def DirectorySize(directory):
+  """
+  Returns the total size, in bytes, of the files contained in a directory and
+  its subdirectories. This is a convenient estimate of the cost of analyzing a
+  simulation, e.g. for ScheduleWork.
+  """
+  import os
+  size = 0
+  for root, dirs, files in os.walk(directory):
+    for name in files:
+      size += os.path.getsize(os.path.join(root, name))
+
+  return size
+
 # -------------------------- matplotlib variables --------------------------- #
 
 # -- morgenstemning colormap
 # https://www.osapublishing.org/DirectPDFAccess/1A428D10-90A3-7D1F-A46F3712F727F357_252779/oe-21-8-9862.pdf
-import matplotlib as mpl
 morgen_colors=[[0.0, 0.0, 0.0],
                [0.0003007843137254902, 0.004015294117647059, 0.005722352941176471],
                [0.0005015686274509805, 0.007930588235294118, 0.011444705882352942],
@@ -419,5 +568,18 @@ morgen_colors=[[0.0, 0.0, 0.0],
 
 morgen_colors_r = morgen_colors[::-1]
 
-morgenstemning_cmap   = mpl.colors.ListedColormap(morgen_colors,  'morgenstemning')
-morgenstemning_r_cmap = mpl.colors.ListedColormap(morgen_colors_r,'inv_morgenstemning')
\ No newline at end of file
+# -- The colormaps are only built, and matplotlib imported, on first use.
+lazy_colormaps = {'morgenstemning_cmap':   (morgen_colors,  'morgenstemning'),
+                  'morgenstemning_r_cmap': (morgen_colors_r,'inv_morgenstemning')}
+
+def __getattr__(name):
+  """
+  Builds the colormaps of lazy_colormaps when they are first accessed.
+  """
+  if name not in lazy_colormaps:
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+  import matplotlib as mpl
+  colors, cmapName = lazy_colormaps[name]
+  globals()[name]  = mpl.colors.ListedColormap(colors, cmapName)
+  return globals()[name]